@@ -1,18 +1,43 @@
 import dash
-from dash import dcc, html
-from dash.dependencies import Input, Output, State
-import pandas as pd
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from google_analytics import fetch_google_analytics_data
-from hulu import scrape_campaign_data
-from datetime import datetime, timedelta
+from dash import callback, clientside_callback, dcc, html
+from dash.dependencies import Input, Output, State, ClientsideFunction
+from driver_pool import account_key
+from jobs import JobQueue
+from instrumentation import instrumented, register_metrics
+from report_export import register_reports
+from datetime import timedelta
+import logging
+import os
+import time
+
+logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'), format='%(asctime)s %(levelname)s %(name)s %(message)s')
 
 external_stylesheets = ['https://stackpath.bootstrapcdn.com/bootstrap/4.5.2/css/bootstrap.min.css', '/assets/styles.css']
-app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
-app.config.suppress_callback_exceptions = True
 
-app.layout = html.Div(children=[
+# Hulu scrapes run in the background so callback workers are never held by a browser.
+# Job status lives in SQLite so any worker process can answer a poll.
+JOBS_DB = os.environ.get('JOBS_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'jobs.sqlite3'))
+scrape_jobs = JobQueue(JOBS_DB, max_workers=int(os.environ.get('HULU_SCRAPE_WORKERS', 2)))
+# Dashboards render from the local metrics store; stored GA data older than
+# this is refreshed in the background while the stored copy is shown.
+refresh_jobs = JobQueue(JOBS_DB, max_workers=1)
+GA_REFRESH_SECONDS = int(os.environ.get('GA_REFRESH_SECONDS', 900))
+# Open dashboards check their source's version in the store this often and
+# re-render only when it changed (see refresher.py for scheduled refreshes).
+VERSION_POLL_SECONDS = int(os.environ.get('VERSION_POLL_SECONDS', 30))
+
+# The GA and Hulu backends (gRPC client, selenium, pandas, plotly figures) are
+# imported inside the callbacks that need them, so workers boot without them
+# and a dashboard that is never opened never loads its backend.
+# benchmarks/bench_import_time.py keeps this import light.
+
+def refresh_google_analytics(progress=None):
+    from google_analytics import fetch_google_analytics_data, PROPERTY_ID
+    from metrics_store import metrics_store
+    # Only submitted once the stored data is stale, so skip the report cache's TTL.
+    metrics_store.ingest_ga_daily(PROPERTY_ID, fetch_google_analytics_data(max_age=0))
+
+layout = html.Div(children=[
     html.Nav(className='navbar navbar-expand-lg', children=[
         html.A(className='navbar-brand', href='/', children=[
             html.Img(src='/assets/logo_footer.webp', id='logo')
@@ -31,11 +56,12 @@ app.layout = html.Div(children=[
     ])
 ])
 
-@app.callback(
+@callback(
     Output('main-content', 'children'),
     [Input('google-button', 'n_clicks'),
      Input('hulu-button', 'n_clicks')]
 )
+@instrumented('app.display_page')
 def display_page(google_clicks, hulu_clicks):
     if google_clicks > 0:
         return html.Div([
@@ -60,8 +86,12 @@ def display_page(google_clicks, hulu_clicks):
                         dcc.Input(id='password', type='password', placeholder='Enter your password', className='form-control', required=True)
                     ]),
                     html.Div(className="form-group", children=[
-                        html.Label("Campaign URL:", htmlFor="campaign-url"),
-                        dcc.Input(id='campaign-url', type='text', placeholder='Enter Hulu campaign URL', className='form-control', required=True)
+                        html.Label("Campaign URLs (one per line):", htmlFor="campaign-url"),
+                        dcc.Textarea(id='campaign-url', placeholder='Enter one or more Hulu campaign URLs', className='form-control')
+                    ]),
+                    html.Div(className="form-group", children=[
+                        html.Label("Campaign list URL (optional):", htmlFor="campaign-list-url"),
+                        dcc.Input(id='campaign-list-url', type='text', placeholder="Compare every campaign on an advertiser's campaign list", className='form-control')
                     ]),
                     html.Button('Submit', id='submit-button', n_clicks=0, className='btn btn-primary btn-block'),
                 ], style={'max-width': '500px', 'margin': '0 auto', 'padding-top': '50px'})
@@ -72,62 +102,135 @@ def display_page(google_clicks, hulu_clicks):
         html.Button('Hulu Campaign Data Visualization', id='hulu-button', n_clicks=0, className='btn btn-primary m-2')
     ])
 
-@app.callback(
+def ga_store_data(df):
+    from google_analytics import METRICS
+    from figures import METRIC_LABELS
+    # Columnar and compact: one date list plus one value list per metric.
+    return {
+        'date': df['date'].dt.strftime('%Y-%m-%d').tolist(),
+        'metrics': [{'name': metric, 'label': METRIC_LABELS.get(metric, metric), 'values': df[metric].tolist()}
+                    for metric in METRICS if metric in df.columns],
+    }
+
+@callback(
     [Output('form-or-dashboard', 'style'),
      Output('graph-container', 'style'),
      Output('graph-container', 'children')],
     [Input('load-data-button', 'n_clicks')]
 )
+@instrumented('app.update_google_graph')
 def update_google_graph(n_clicks):
     if n_clicks > 0:
-        df = fetch_google_analytics_data()
-        
-        if not df.empty:
-            df['date'] = pd.to_datetime(df['date'])
-            end_date = df['date'].max()
-            start_date = end_date - timedelta(days=30)
-            df = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
+        from google_analytics import PROPERTY_ID, METRICS
+        from metrics_store import metrics_store
+        from figures import METRIC_LABELS, build_ga_figure, cached_figure
+        last_ingested = metrics_store.ga_last_ingested(PROPERTY_ID)
+        if last_ingested is None:
+            # Nothing stored yet, so the very first load has to wait for GA.
+            refresh_google_analytics()
+        elif time.time() - last_ingested > GA_REFRESH_SECONDS:
+            refresh_jobs.submit(('ga', PROPERTY_ID), refresh_google_analytics)
 
-            df['newUsers'] = pd.to_numeric(df['newUsers'])
-            df['activeUsers'] = pd.to_numeric(df['activeUsers'])
-            df['eventCount'] = pd.to_numeric(df['eventCount'])
-            df['totalUsers'] = pd.to_numeric(df['totalUsers'])
-            df['sessions'] = pd.to_numeric(df['sessions'])
+        # The whole stored history goes to the browser once; the date range and
+        # metric toggles below are then handled client-side (assets/ga_dashboard.js).
+        history = metrics_store.ga_daily(PROPERTY_ID, METRICS)
 
-            df = df.sort_values(by='date')
-
-            fig = make_subplots(rows=5, cols=1, 
-                                subplot_titles=('New Users', 'Returning Users', 'Key Events', 'Users', 'Sessions'),
-                                vertical_spacing=0.1)
-
-            fig.add_trace(go.Scatter(x=df['date'], y=df['newUsers'], mode='lines+markers', name='New Users'), row=1, col=1)
-            fig.update_yaxes(title_text='New Users', row=1, col=1, range=[0, df['newUsers'].max() + 5])
-
-            fig.add_trace(go.Scatter(x=df['date'], y=df['activeUsers'], mode='lines+markers', name='Returning Users'), row=2, col=1)
-            fig.update_yaxes(title_text='Returning Users', row=2, col=1, range=[0, df['activeUsers'].max() + 5])
-
-            fig.add_trace(go.Scatter(x=df['date'], y=df['eventCount'], mode='lines+markers', name='Key Events'), row=3, col=1)
-            fig.update_yaxes(title_text='Key Events', row=3, col=1, range=[0, df['eventCount'].max() + 5])
-
-            fig.add_trace(go.Scatter(x=df['date'], y=df['totalUsers'], mode='lines+markers', name='Users'), row=4, col=1)
-            fig.update_yaxes(title_text='Users', row=4, col=1, range=[0, df['totalUsers'].max() + 5])
+        if not history.empty:
+            end_date = history['date'].max()
+            start_date = end_date - timedelta(days=30)
+            df = history[history['date'] >= start_date]
+            fig = cached_figure('ga', df, build_ga_figure)
+            return {'display': 'none'}, {'display': 'block'}, html.Div([
+                dcc.Store(id='ga-data', data=ga_store_data(history)),
+                dcc.Store(id='ga-version', data=metrics_store.source_version(f'ga:{PROPERTY_ID}')),
+                dcc.Interval(id='ga-version-poll', interval=VERSION_POLL_SECONDS * 1000),
+                html.Div(className='d-flex align-items-center flex-wrap mb-3', children=[
+                    dcc.DatePickerRange(
+                        id='ga-date-range',
+                        min_date_allowed=history['date'].min().date(),
+                        max_date_allowed=end_date.date(),
+                        start_date=start_date.date(),
+                        end_date=end_date.date(),
+                        className='mr-4'
+                    ),
+                    dcc.Checklist(
+                        id='ga-metrics',
+                        options=[{'label': METRIC_LABELS[metric], 'value': metric} for metric in METRICS],
+                        value=list(METRICS),
+                        inline=True,
+                        inputStyle={'margin-right': '4px', 'margin-left': '12px'}
+                    )
+                ]),
+                dcc.Graph(id='ga-graph', figure=fig)
+            ])
+    return {'textAlign': 'center', 'paddingTop': '20%'}, {'display': 'none'}, None
 
-            fig.add_trace(go.Scatter(x=df['date'], y=df['sessions'], mode='lines+markers', name='Sessions'), row=5, col=1)
-            fig.update_yaxes(title_text='Sessions', row=5, col=1, range=[0, df['sessions'].max() + 5])
+clientside_callback(
+    ClientsideFunction(namespace='ga', function_name='render'),
+    Output('ga-graph', 'figure'),
+    [Input('ga-date-range', 'start_date'),
+     Input('ga-date-range', 'end_date'),
+     Input('ga-metrics', 'value'),
+     Input('ga-data', 'data')],
+    prevent_initial_call=True
+)
 
-            fig.update_layout(height=1500, width=1200, title_text="Google Analytics Data")
-            return {'display': 'none'}, {'display': 'block'}, dcc.Graph(figure=fig)
-    return {'textAlign': 'center', 'paddingTop': '20%'}, {'display': 'none'}, None
+@callback(
+    [Output('ga-data', 'data'),
+     Output('ga-version', 'data'),
+     Output('ga-date-range', 'max_date_allowed'),
+     Output('ga-date-range', 'end_date')],
+    [Input('ga-version-poll', 'n_intervals')],
+    [State('ga-version', 'data'),
+     State('ga-date-range', 'max_date_allowed'),
+     State('ga-date-range', 'end_date')],
+    prevent_initial_call=True
+)
+@instrumented('app.poll_ga_version')
+def poll_ga_version(n_intervals, known_version, max_date, end_date):
+    from google_analytics import PROPERTY_ID, METRICS
+    from metrics_store import metrics_store
+    version = metrics_store.source_version(f'ga:{PROPERTY_ID}')
+    # Idle polls return no_update rather than raising PreventUpdate, which the
+    # callback's span would count as an error.
+    if version == known_version:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+    history = metrics_store.ga_daily(PROPERTY_ID, METRICS)
+    latest = history['date'].max().date()
+    # A range that ended on the newest day follows new days in; one the user
+    # moved into the past stays where it is.
+    following = end_date and max_date and str(end_date)[:10] == str(max_date)[:10]
+    return ga_store_data(history), version, latest, latest if following else dash.no_update
 
-@app.callback(
+@callback(
     Output('form-or-graph', 'children'),
     [Input('submit-button', 'n_clicks')],
-    [State('email', 'value'), State('password', 'value'), State('campaign-url', 'value')]
+    [State('email', 'value'), State('password', 'value'), State('campaign-url', 'value'), State('campaign-list-url', 'value')]
 )
-def update_hulu_graph(n_clicks, email, password, campaign_url):
-    if n_clicks > 0 and email and password and campaign_url:
-        graphs = scrape_campaign_data(email, password, campaign_url)
-        return graphs
+@instrumented('app.update_hulu_graph')
+def update_hulu_graph(n_clicks, email, password, campaign_url, campaign_list_url):
+    campaign_urls = [url.strip() for url in (campaign_url or '').splitlines() if url.strip()]
+    if n_clicks > 0 and email and password and (campaign_urls or campaign_list_url):
+        from hulu import scrape_campaign_data, scrape_campaigns_data, stored_campaign_graphs
+        scrape_job = {}
+        if len(campaign_urls) == 1 and not campaign_list_url:
+            job_id = scrape_jobs.submit((account_key(email, password), campaign_urls[0]),
+                                        scrape_campaign_data, email, password, campaign_urls[0],
+                                        subject=campaign_urls[0])
+            # Lets the page follow the campaign's later refreshes once the job row
+            # is gone; the account key is checked against the store on every poll.
+            scrape_job = {'subject': campaign_urls[0], 'account': account_key(email, password)}
+        else:
+            job_id = scrape_jobs.submit((account_key(email, password), tuple(sorted(campaign_urls)), campaign_list_url),
+                                        scrape_campaigns_data, email, password, campaign_urls, campaign_list_url)
+        # Show the last stored snapshot right away, if this account has one, while the job refreshes it.
+        stored = stored_campaign_graphs(email, password, campaign_urls[0]) if len(campaign_urls) == 1 and not campaign_list_url else None
+        return html.Div([
+            dcc.Store(id='scrape-job', data={**scrape_job, 'id': job_id, 'stored': stored is not None}),
+            dcc.Interval(id='scrape-poll', interval=1000),
+            html.Div(id='scrape-alert'),
+            html.Div(id='scrape-status', children=stored or scrape_progress('queued'))
+        ])
     return html.Div(id='form-container', children=[
         html.H2('Enter your Hulu Credentials and Campaign URL', className='mb-4'),
         html.Div(className="form-group", children=[
@@ -139,11 +242,85 @@ def update_hulu_graph(n_clicks, email, password, campaign_url):
             dcc.Input(id='password', type='password', placeholder='Enter your password', className='form-control', required=True)
         ]),
         html.Div(className="form-group", children=[
-            html.Label("Campaign URL:", htmlFor="campaign-url"),
-            dcc.Input(id='campaign-url', type='text', placeholder='Enter Hulu campaign URL', className='form-control', required=True)
+            html.Label("Campaign URLs (one per line):", htmlFor="campaign-url"),
+            dcc.Textarea(id='campaign-url', placeholder='Enter one or more Hulu campaign URLs', className='form-control')
+        ]),
+        html.Div(className="form-group", children=[
+            html.Label("Campaign list URL (optional):", htmlFor="campaign-list-url"),
+            dcc.Input(id='campaign-list-url', type='text', placeholder="Compare every campaign on an advertiser's campaign list", className='form-control')
         ]),
         html.Button('Submit', id='submit-button', n_clicks=0, className='btn btn-primary btn-block'),
     ], style={'max-width': '500px', 'margin': '0 auto', 'padding-top': '50px'})
 
+def scrape_progress(phase):
+    from hulu import PHASES
+    # Batch scrapes report e.g. 'loading (3/12 campaigns)'; the bar follows the leading phase.
+    percent = int(100 * (PHASES.index(phase.split(' (')[0]) + 1) / len(PHASES)) if phase.split(' (')[0] in PHASES else 0
+    return html.Div(style={'max-width': '500px', 'margin': '0 auto', 'padding-top': '50px'}, children=[
+        html.P(f'{phase.capitalize()}...', className='mb-2'),
+        html.Div(className='progress', children=[
+            html.Div(className='progress-bar progress-bar-striped progress-bar-animated', style={'width': f'{percent}%'})
+        ])
+    ])
+
+@callback(
+    [Output('scrape-status', 'children'),
+     Output('scrape-alert', 'children'),
+     Output('scrape-poll', 'disabled'),
+     Output('scrape-poll', 'interval'),
+     Output('scrape-job', 'data')],
+    [Input('scrape-poll', 'n_intervals')],
+    [State('scrape-job', 'data')]
+)
+@instrumented('app.poll_hulu_job')
+def poll_hulu_job(n_intervals, scrape_job):
+    if 'version' in scrape_job:
+        return poll_campaign_version(scrape_job)
+    job = scrape_jobs.get(scrape_job['id'])
+    if job is None:
+        return "Error: This request has expired, please submit it again.", None, True, dash.no_update, dash.no_update
+    if job.status == 'failed':
+        error = f"An error occurred: {job.error}"
+        if scrape_job['stored']:
+            # The stored snapshot stays on screen and keeps following refreshes.
+            return follow_campaign(dash.no_update, html.Div(error, className='alert alert-danger'), scrape_job)
+        return error, None, True, dash.no_update, dash.no_update
+    if job.status == 'done':
+        if 'subject' not in scrape_job or not isinstance(job.result, list):
+            return job.result, None, True, dash.no_update, dash.no_update
+        return follow_campaign(job.result, None, scrape_job)
+    if scrape_job['stored']:
+        return dash.no_update, None, False, dash.no_update, dash.no_update
+    return scrape_progress(job.phase), None, False, dash.no_update, dash.no_update
+
+def follow_campaign(status, alert, scrape_job):
+    # A single campaign stays live: its version is polled slowly and the
+    # graphs are re-rendered from the store only after a refresh changed them.
+    from metrics_store import metrics_store
+    version = metrics_store.source_version(f"hulu:{scrape_job['subject']}")
+    return status, alert, False, VERSION_POLL_SECONDS * 1000, {**scrape_job, 'version': version}
+
+def poll_campaign_version(scrape_job):
+    # Reads the store directly rather than the job, which is pruned after an hour.
+    from metrics_store import metrics_store
+    if metrics_store.hulu_last_ingested(scrape_job['subject'], scrape_job['account']) is None:
+        return dash.no_update, dash.no_update, True, dash.no_update, dash.no_update
+    version = metrics_store.source_version(f"hulu:{scrape_job['subject']}")
+    if version == scrape_job['version']:
+        return dash.no_update, dash.no_update, False, dash.no_update, dash.no_update
+    from hulu import campaign_graphs
+    return campaign_graphs(scrape_job['subject']), None, False, dash.no_update, {**scrape_job, 'version': version}
+
+def create_app():
+    # Callbacks above are registered globally, so each app built here gets all of them.
+    # compress=True gzips/brotli-encodes callback JSON and component bundles (flask-compress).
+    app = dash.Dash(__name__, external_stylesheets=external_stylesheets, compress=True)
+    app.config.suppress_callback_exceptions = True
+    app.layout = layout
+    register_metrics(app.server)
+    register_reports(app.server)
+    return app
+
 if __name__ == '__main__':
-    app.run_server(debug=True, host="0.0.0.0", port="8050")
+    # Development server; production runs wsgi.py under gunicorn (see gunicorn.conf.py).
+    create_app().run_server(debug=True, host="0.0.0.0", port="8050")
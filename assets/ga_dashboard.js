@@ -0,0 +1,62 @@
+// Client-side rendering of the Google Analytics view. The server ships the
+// full daily history once (dcc.Store 'ga-data'); changing the date range or
+// the metric selection rebuilds the figure here without a server round trip,
+// as does a newer history pushed into the store after a background refresh.
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    ga: {
+        render: function (startDate, endDate, selected, data) {
+            if (!data) {
+                return window.dash_clientside.no_update;
+            }
+            var start = startDate ? startDate.slice(0, 10) : null;
+            var end = endDate ? endDate.slice(0, 10) : null;
+            var rows = [];
+            data.date.forEach(function (day, i) {
+                if ((!start || day >= start) && (!end || day <= end)) {
+                    rows.push(i);
+                }
+            });
+            var x = rows.map(function (i) { return data.date[i]; });
+            var metrics = data.metrics.filter(function (metric) {
+                return (selected || []).indexOf(metric.name) !== -1;
+            });
+
+            var count = Math.max(metrics.length, 1);
+            var gap = 0.1 / count;
+            var traces = [];
+            var layout = {
+                height: 300 * count,
+                width: 1200,
+                title: {text: 'Google Analytics Data'},
+                annotations: []
+            };
+            metrics.forEach(function (metric, k) {
+                var axis = k === 0 ? '' : String(k + 1);
+                var y = rows.map(function (i) { return metric.values[i]; });
+                var top = 1 - k / count;
+                var bottom = 1 - (k + 1) / count + gap;
+                traces.push({
+                    type: x.length > 1000 ? 'scattergl' : 'scatter',
+                    mode: x.length > 1000 ? 'lines' : 'lines+markers',
+                    x: x,
+                    y: y,
+                    name: metric.label,
+                    xaxis: 'x' + axis,
+                    yaxis: 'y' + axis
+                });
+                layout['xaxis' + axis] = {domain: [0, 1], anchor: 'y' + axis};
+                layout['yaxis' + axis] = {
+                    domain: [bottom, top],
+                    anchor: 'x' + axis,
+                    title: {text: metric.label},
+                    range: [0, Math.max.apply(null, y.concat([0])) + 5]
+                };
+                layout.annotations.push({
+                    text: metric.label, showarrow: false, xref: 'paper', yref: 'paper',
+                    x: 0.5, y: top, xanchor: 'center', yanchor: 'bottom', font: {size: 16}
+                });
+            });
+            return {data: traces, layout: layout};
+        }
+    }
+});
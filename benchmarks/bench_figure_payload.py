@@ -0,0 +1,52 @@
+# Figure JSON size and build time as the plotted series grows, with plain
+# go.Scatter against figures.line_trace (Scattergl + LTTB above the threshold),
+# plus the cost of a figure cache hit.
+#
+#   python benchmarks/bench_figure_payload.py --points 30 1000 100000 1000000
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+import plotly.io as pio
+from figures import cached_figure, line_trace
+
+def series(points):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'date': pd.date_range('2024-01-01', periods=points, freq='min'),
+        'sessions': np.cumsum(rng.normal(0, 10, points)) + 10_000,
+    })
+
+def build_plain(df):
+    return go.Figure(go.Scatter(x=df['date'], y=df['sessions'], mode='lines+markers', name='Sessions'))
+
+def build_downsampled(df):
+    return go.Figure(line_trace(df['date'], df['sessions'], 'Sessions'))
+
+def timed(func):
+    start = time.perf_counter()
+    result = func()
+    return time.perf_counter() - start, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--points', type=int, nargs='+', default=[30, 1_000, 100_000, 1_000_000])
+    args = parser.parse_args()
+
+    print(f"{'points':>10} {'plain KB':>10} {'plain s':>8} {'lttb KB':>9} {'lttb s':>8} {'hit ms':>8}")
+    for points in args.points:
+        df = series(points)
+        plain_time, plain = timed(lambda: pio.to_json(build_plain(df)))
+        lttb_time, downsampled = timed(lambda: pio.to_json(cached_figure('bench', df, build_downsampled)))
+        hit_time, _ = timed(lambda: cached_figure('bench', df, build_downsampled))
+        print(f'{points:>10} {len(plain) / 1024:>10.0f} {plain_time:>8.2f} '
+              f'{len(downsampled) / 1024:>9.0f} {lttb_time:>8.2f} {hit_time * 1000:>8.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,98 @@
+# Throughput and peak memory of GA report ingestion on synthetic responses:
+# the old dict-per-row conversion against the paged columnar reader
+# (google_analytics.read_report), with and without chunking.
+#
+#   python benchmarks/bench_ga_ingestion.py --rows 1000000
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from google.analytics.data_v1beta.types import RunReportRequest, RunReportResponse, MetricType
+from google_analytics import read_report
+
+SOURCES = ['google / organic', '(direct) / (none)', 'bing / organic', 'newsletter / email', 'hulu / cpm']
+
+class FakeClient:
+    # Serves limit/offset pages out of one pre-built response, like runReport does.
+    def __init__(self, rows):
+        self.raw = RunReportResponse.pb()()
+        self.raw.dimension_headers.add(name='dateHour')
+        self.raw.dimension_headers.add(name='sessionSourceMedium')
+        self.raw.metric_headers.add(name='sessions', type_=MetricType.TYPE_INTEGER)
+        self.raw.metric_headers.add(name='engagementRate', type_=MetricType.TYPE_FLOAT)
+        for i in range(rows):
+            row = self.raw.rows.add()
+            row.dimension_values.add(value=f'202401{1 + i // 24 % 28:02d}{i % 24:02d}')
+            row.dimension_values.add(value=SOURCES[i % len(SOURCES)])
+            row.metric_values.add(value=str(i % 997))
+            row.metric_values.add(value=str((i % 100) / 100))
+        self.raw.row_count = rows
+
+    def run_report(self, request):
+        page = RunReportResponse.pb()()
+        page.dimension_headers.extend(self.raw.dimension_headers)
+        page.metric_headers.extend(self.raw.metric_headers)
+        page.rows.extend(self.raw.rows[request.offset:request.offset + request.limit])
+        page.row_count = self.raw.row_count
+        return RunReportResponse.wrap(page)
+
+def legacy(client, request):
+    request.limit = client.raw.row_count
+    response = client.run_report(request)
+    dimension_headers = [header.name for header in response.dimension_headers]
+    metric_headers = [header.name for header in response.metric_headers]
+    data = []
+    for row in response.rows:
+        row_data = {}
+        for header, dimension_value in zip(dimension_headers, row.dimension_values):
+            row_data[header] = dimension_value.value
+        for header, metric_value in zip(metric_headers, row.metric_values):
+            row_data[header] = metric_value.value
+        data.append(row_data)
+    return pd.DataFrame(data)
+
+def columnar(client, request):
+    return read_report(client, request)
+
+def chunked(client, request):
+    rows = 0
+    for chunk in read_report(client, request, chunks=True):
+        rows += len(chunk)
+    return rows
+
+def measure(func, client):
+    # Timed and traced in separate runs: tracemalloc slows allocation-heavy
+    # code several times over.
+    start = time.perf_counter()
+    result = func(client, RunReportRequest(property='properties/0'))
+    elapsed = time.perf_counter() - start
+    rows = result if isinstance(result, int) else len(result)
+    del result
+    tracemalloc.start()
+    func(client, RunReportRequest(property='properties/0'))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, rows
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--skip-legacy', action='store_true')
+    args = parser.parse_args()
+
+    client = FakeClient(args.rows)
+    paths = [('columnar', columnar), ('chunked', chunked)]
+    if not args.skip_legacy:
+        paths.insert(0, ('dict-per-row', legacy))
+    print(f"{'path':>14} {'seconds':>9} {'rows/s':>12} {'peak MB':>9}")
+    for name, func in paths:
+        elapsed, peak, rows = measure(func, client)
+        print(f'{name:>14} {elapsed:>9.2f} {rows / elapsed:>12,.0f} {peak / 2**20:>9.1f}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# Cold-start import cost of the web entry points, measured with
+# `python -X importtime` in fresh interpreters (best of --repeat runs).
+#
+# app must stay light: the GA and Hulu backends are imported on first use, so
+# none of the LAZY modules may be pulled in by `import app`. The script exits
+# non-zero if one is, or if importing an entry point exceeds its budget.
+#
+#   python benchmarks/bench_import_time.py
+#   python benchmarks/bench_import_time.py --modules app wsgi hulu google_analytics --top 25
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Backend dependencies that app.py and wsgi.py must not import eagerly.
+LAZY = ('selenium', 'google.analytics', 'grpc', 'pandas', 'hulu', 'google_analytics', 'metrics_store', 'figures')
+# Seconds; generous enough for a slow CI box, tight enough to catch a backend creeping back in.
+BUDGETS = {'app': 2.0, 'wsgi': 2.5}
+
+def import_profile(module):
+    # Returns ({module: cumulative seconds}, total seconds) for one fresh import.
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+                            cwd=ROOT, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise SystemExit(f'Error: importing {module} failed:\n{result.stderr[-2000:]}')
+    cumulative = {}
+    total = 0
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        _, cumulative_us, name = line[len('import time:'):].split('|')
+        # Nesting is shown by indentation; unindented entries are top-level imports.
+        if not name.startswith('  '):
+            total += int(cumulative_us)
+        cumulative[name.strip()] = int(cumulative_us) / 1e6
+    return cumulative, total / 1e6
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--modules', nargs='+', default=['app', 'wsgi'])
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args()
+
+    failures = 0
+    for module in args.modules:
+        runs = [import_profile(module) for _ in range(args.repeat)]
+        cumulative, total = min(runs, key=lambda run: run[1])
+        budget = BUDGETS.get(module)
+        flag = '  OVER BUDGET' if budget is not None and total > budget else ''
+        failures += bool(flag)
+        print(f'import {module}: {total:.3f}s (best of {args.repeat}, budget {budget if budget is not None else "-"}){flag}')
+        for name, seconds in sorted(cumulative.items(), key=lambda item: -item[1])[:args.top]:
+            print(f'  {seconds:8.3f}s  {name}')
+
+        if module in BUDGETS:
+            eager = sorted(name for name in cumulative
+                           if any(name == lazy or name.startswith(lazy + '.') for lazy in LAZY))
+            if eager:
+                failures += 1
+                print(f'  Error: {module} imports backend modules eagerly: {", ".join(eager[:10])}')
+        print()
+    sys.exit(1 if failures else 0)
+
+if __name__ == '__main__':
+    main()
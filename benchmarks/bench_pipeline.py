@@ -0,0 +1,120 @@
+# End-to-end timings of the scrape -> parse -> render pipeline against local
+# stand-ins: Hulu pages served by replay.ReplayServer to headless Firefox (and
+# as report JSON to hulu_api) and GA responses from replay.FakeAnalyticsClient.
+# No credentials are needed.
+#
+# Each stage is timed at several data sizes and compared to the limits in
+# pipeline_thresholds.json; the script exits non-zero on a regression.
+#
+#   python benchmarks/bench_pipeline.py                    # Hulu + GA
+#   python benchmarks/bench_pipeline.py --skip-browser     # GA and parsing only
+#   python benchmarks/bench_pipeline.py --write-thresholds # record current timings (x2) as limits
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+THRESHOLDS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipeline_thresholds.json')
+
+def timed(results, stage, size, func):
+    start = time.perf_counter()
+    value = func()
+    results[f'{stage}@{size}'] = time.perf_counter() - start
+    return value
+
+def bench_hulu(results, sizes, fixtures):
+    import hulu
+    import hulu_api
+    from figures import _figure_cache
+    from replay import ReplayServer, synthesize_hulu_page
+
+    os.makedirs(os.path.join(fixtures, 'hulu'), exist_ok=True)
+    for days in sizes:
+        with open(os.path.join(fixtures, 'hulu', f'bench-{days}.html'), 'w') as f:
+            f.write(synthesize_hulu_page(days=days, breakdown_rows=max(10, days // 10)))
+
+    with ReplayServer(fixtures) as server:
+        hulu.LOGIN_URL = server.url + '/login'
+        driver = timed(results, 'hulu.launch', 0, hulu.create_driver)
+        try:
+            timed(results, 'hulu.login', 0, lambda: hulu.login(driver, 'bench@example.com', 'bench'))
+            for days in sizes:
+                url = server.campaign_url(f'bench-{days}')
+                timed(results, 'hulu.load', days, lambda: hulu.open_campaign(driver, 'bench@example.com', 'bench', url))
+                frames = timed(results, 'hulu.extract', days, lambda: hulu.extract_all_tables(driver))
+                campaign = timed(results, 'hulu.parse', days, lambda: hulu.normalize_campaign_tables(frames))
+                _figure_cache.clear()
+                timed(results, 'hulu.figure', days, lambda: hulu.campaign_figure(campaign))
+
+            # The same reports as JSON over HTTP with the browser's cookies.
+            hulu_api.REPORT_URL = server.report_url_template
+            session = hulu.remember_api_session('bench@example.com', 'bench', driver)
+            for days in sizes:
+                url = server.campaign_url(f'bench-{days}')
+                timed(results, 'hulu.api', days, lambda: hulu_api.fetch_campaign_tables(session, url))
+        finally:
+            driver.quit()
+
+def bench_ga(results, sizes, fixtures):
+    import google_analytics
+    from ga_cache import ReportCache
+    from figures import _figure_cache, build_ga_figure
+    from metrics_store import MetricsStore
+    from replay import FakeAnalyticsClient, synthesize_ga_response
+
+    for days in sizes:
+        google_analytics.set_client(FakeAnalyticsClient(synthesize_ga_response(days=days)))
+        # A fresh, zero-TTL cache so every run really goes through the client.
+        google_analytics.report_cache = ReportCache(os.path.join(fixtures, f'ga-cache-{days}'), ttl_seconds=0)
+        date_range = (f'{days - 1}daysAgo', 'today')
+        df = timed(results, 'ga.fetch', days, lambda: google_analytics.fetch_google_analytics_data(date_range=date_range))
+        store = MetricsStore(os.path.join(fixtures, f'metrics-{days}.sqlite3'))
+        timed(results, 'ga.ingest', days, lambda: store.ingest_ga_daily(google_analytics.PROPERTY_ID, df))
+        history = timed(results, 'ga.query', days, lambda: store.ga_daily(google_analytics.PROPERTY_ID, google_analytics.METRICS))
+        _figure_cache.clear()
+        timed(results, 'ga.figure', days, lambda: build_ga_figure(history).to_json())
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--hulu-days', type=int, nargs='+', default=[30, 365, 2000])
+    parser.add_argument('--ga-days', type=int, nargs='+', default=[30, 365, 3650])
+    parser.add_argument('--skip-browser', action='store_true')
+    parser.add_argument('--write-thresholds', action='store_true')
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as fixtures:
+        if not args.skip_browser:
+            bench_hulu(results, args.hulu_days, fixtures)
+        bench_ga(results, args.ga_days, fixtures)
+
+    thresholds = {}
+    if os.path.exists(THRESHOLDS_PATH):
+        with open(THRESHOLDS_PATH) as f:
+            thresholds = json.load(f)
+
+    failures = 0
+    print(f"{'stage@size':>22} {'seconds':>9} {'limit':>9}")
+    for key, seconds in results.items():
+        limit = thresholds.get(key)
+        flag = ''
+        if limit is not None and seconds > limit:
+            flag = '  REGRESSION'
+            failures += 1
+        print(f"{key:>22} {seconds:>9.3f} {limit if limit is not None else '-':>9}{flag}")
+
+    if args.write_thresholds:
+        thresholds.update({key: round(max(seconds * 2, 0.05), 3) for key, seconds in results.items()})
+        with open(THRESHOLDS_PATH, 'w') as f:
+            json.dump(thresholds, f, indent=2, sort_keys=True)
+            f.write('\n')
+        print(f'Wrote {THRESHOLDS_PATH}')
+    sys.exit(1 if failures and not args.write_thresholds else 0)
+
+if __name__ == '__main__':
+    main()
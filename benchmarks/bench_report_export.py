@@ -0,0 +1,63 @@
+# Size of a static Hulu campaign report written the old way (fig.write_html
+# with plotly.js inlined, as in output.html) against report_export with the
+# shared hashed plotly.js asset and compact figure data, raw and gzipped,
+# for a batch of --reports reports.
+#
+#   python benchmarks/bench_report_export.py --days 30 365 2000 --reports 10
+import argparse
+import gzip
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from hulu import build_campaign_figure
+from report_export import export_reports
+
+def campaign(days):
+    rng = np.random.default_rng(days)
+    labels = [f'Segment {i}' for i in range(20)]
+    breakdown = lambda: pd.DataFrame({'label': labels, 'impressions': rng.integers(0, 1_000_000, len(labels))})
+    return {
+        'daily': pd.DataFrame({'day': pd.date_range('2024-01-01', periods=days, freq='D'),
+                               'impressions': rng.integers(1_000, 100_000, days)}),
+        'audiences': breakdown(), 'platforms': breakdown(), 'content_genres': breakdown(),
+    }
+
+def sizes(paths):
+    raw = sum(os.path.getsize(path) for path in paths)
+    zipped = 0
+    for path in paths:
+        with open(path, 'rb') as f:
+            zipped += len(gzip.compress(f.read()))
+    return raw / 1024, zipped / 1024
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--days', type=int, nargs='+', default=[30, 365, 2000])
+    parser.add_argument('--reports', type=int, default=10)
+    args = parser.parse_args()
+
+    print(f"{'days':>6} {'inline KB':>10} {'inline gz':>10} {'export KB':>10} {'export gz':>10}")
+    for days in args.days:
+        fig = build_campaign_figure(campaign(days))
+        with tempfile.TemporaryDirectory() as directory:
+            inline = []
+            for i in range(args.reports):
+                path = os.path.join(directory, f'inline-{i}.html')
+                fig.write_html(path, include_plotlyjs=True)
+                inline.append(path)
+            exported = export_reports({f'report-{i}': ('Bench', [fig]) for i in range(args.reports)},
+                                      os.path.join(directory, 'export'), compress=False)
+            # The shared plotly.js asset is counted once for the whole batch.
+            asset_dir = os.path.join(directory, 'export', 'assets')
+            exported += [os.path.join(asset_dir, name) for name in os.listdir(asset_dir) if name.endswith('.min.js')]
+            inline_kb, inline_gz = sizes(inline)
+            export_kb, export_gz = sizes(exported)
+        print(f'{days:>6} {inline_kb:>10.0f} {inline_gz:>10.0f} {export_kb:>10.0f} {export_gz:>10.0f}')
+
+if __name__ == '__main__':
+    main()
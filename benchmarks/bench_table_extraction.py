@@ -0,0 +1,71 @@
+# Compares per-element WebDriver extraction (hulu.extract_table_data) with the
+# single execute_script path (hulu.extract_all_tables) on synthetic campaign
+# tables loaded into headless Firefox.
+#
+#   python benchmarks/bench_table_extraction.py --rows 50 200 500
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from selenium.webdriver.common.by import By
+from hulu import create_driver, extract_table_data, extract_all_tables
+
+TABLE_COLUMNS = [
+    ('Days', 'Total Impressions'),
+    ('Ad', 'Impressions'),
+    ('Creative', 'Impressions'),
+    ('Audiences', 'Impressions'),
+    ('Platforms', 'Impressions'),
+    ('Content Genres', 'Impressions'),
+]
+
+def synthetic_page(rows):
+    tables = []
+    for columns in TABLE_COLUMNS:
+        head = ''.join(f'<th>{column}</th>' for column in columns)
+        body = ''.join(
+            f'<tr><td>{columns[0]} {i}</td><td>{i * 1000:,} impressions</td></tr>'
+            for i in range(rows)
+        )
+        tables.append(f'<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>')
+    return '<html><body>' + ''.join(tables) + '</body></html>'
+
+def timed(func, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[30, 200, 500])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    driver = create_driver()
+    try:
+        print(f"{'rows/table':>10} {'per-element (s)':>16} {'bulk (s)':>10} {'speedup':>8}")
+        for rows in args.rows:
+            with tempfile.NamedTemporaryFile('w', suffix='.html', delete=False) as f:
+                f.write(synthetic_page(rows))
+            try:
+                driver.get('file://' + f.name)
+                per_element, slow = timed(
+                    lambda: [extract_table_data(t) for t in driver.find_elements(By.TAG_NAME, 'table')],
+                    args.repeat)
+                bulk, fast = timed(lambda: extract_all_tables(driver), args.repeat)
+            finally:
+                os.unlink(f.name)
+            assert all(a.equals(b) for a, b in zip(slow, fast)), 'extraction paths disagree'
+            print(f'{rows:>10} {per_element:>16.3f} {bulk:>10.3f} {per_element / bulk:>7.1f}x')
+    finally:
+        driver.quit()
+
+if __name__ == '__main__':
+    main()
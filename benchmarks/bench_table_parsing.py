@@ -0,0 +1,72 @@
+# Times the previous ad hoc parsing (str.replace chains, per-row apply and a
+# list comprehension for category paths) against the schema-driven
+# table_schemas.parse_table on large synthetic Hulu tables.
+#
+#   python benchmarks/bench_table_parsing.py --rows 10000 100000 1000000
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+import pandas as pd
+from table_schemas import parse_table
+
+AUDIENCES = ['Demographic | Adults 18-49', 'Interest | Sports | Football', 'Behavioral | Auto Intenders', 'Custom | Retargeting']
+
+def synthetic_tables(rows):
+    rng = np.random.default_rng(0)
+    impressions = pd.Series(rng.integers(0, 5_000_000, rows)).map('{:,} impressions'.format)
+    # Ten years of days, repeated: a plain daily range runs past pandas' last
+    # representable date well before a million rows.
+    days = pd.Series(pd.Timestamp('2020-01-06') + pd.to_timedelta(np.arange(rows) % 3650, unit='D'))
+    daily = pd.DataFrame({
+        'Days': days.dt.strftime('%a, %m/%d/%y') + ' - ' + (days + pd.Timedelta(days=6)).dt.strftime('%a, %m/%d/%y'),
+        'Total Impressions': impressions,
+    })
+    audiences = pd.DataFrame({'Audiences': rng.choice(AUDIENCES, rows), 'Impressions': impressions})
+    genres = pd.DataFrame({'Content Genres': rng.choice(['Drama', 'Comedy', 'News', 'Sports'], rows), 'Impressions': impressions})
+    return daily, audiences, genres
+
+def legacy(daily, audiences, genres):
+    daily = daily.copy()
+    daily['Total Impressions'] = daily['Total Impressions'].str.replace(' impressions', '').str.replace(',', '').astype(int)
+    daily['Start Date'] = daily['Days'].str.split(' - ').str[0]
+    daily['Start Date'] = pd.to_datetime(daily['Start Date'], format='%a, %m/%d/%y')
+    audiences = audiences.copy()
+    audiences['Audiences'] = [category.split('|')[-1].strip() for category in audiences['Audiences']]
+    audiences['Impressions'] = audiences['Impressions'].str.replace(' impressions', '').str.replace(',', '').astype(int)
+    genres = genres.copy()
+    genres['Impressions'] = genres['Impressions'].apply(lambda x: int(x.replace(' impressions', '').replace(',', '')) if x.replace(' impressions', '').replace(',', '').isdigit() else 0)
+    return daily, audiences, genres
+
+def schema(daily, audiences, genres):
+    return (parse_table(daily, 'hulu_daily')[0],
+            parse_table(audiences, 'hulu_audiences')[0],
+            parse_table(genres, 'hulu_content_genres')[0])
+
+def best_of(func, tables, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*tables)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'legacy (s)':>11} {'schema (s)':>11} {'speedup':>8}")
+    for rows in args.rows:
+        tables = synthetic_tables(rows)
+        old = best_of(legacy, tables, args.repeat)
+        new = best_of(schema, tables, args.repeat)
+        print(f'{rows:>10} {old:>11.3f} {new:>11.3f} {old / new:>7.1f}x')
+
+if __name__ == '__main__':
+    main()
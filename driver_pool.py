@@ -0,0 +1,342 @@
+import fcntl
+import hashlib
+import hmac
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+# Server-side secret for account_key. ACCOUNT_KEY_SECRET wins; otherwise a
+# random secret is created once in ACCOUNT_KEY_SECRET_FILE and shared by every
+# process on the host. Replacing it orphans stored snapshots and jobs.
+ACCOUNT_KEY_SECRET_FILE = os.environ.get(
+    'ACCOUNT_KEY_SECRET_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'account-key.secret'))
+
+_account_secret = {}
+_account_secret_lock = threading.Lock()
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+def _secret():
+    with _account_secret_lock:
+        if 'value' not in _account_secret:
+            secret = os.environ.get('ACCOUNT_KEY_SECRET')
+            _account_secret['value'] = secret.encode('utf-8') if secret else _secret_from_file(ACCOUNT_KEY_SECRET_FILE)
+        return _account_secret['value']
+
+
+def _secret_from_file(path):
+    if not os.path.exists(path):
+        # Written aside and linked into place, so a process racing this one
+        # either reads the complete file or fails to link and reads the winner's.
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(os.urandom(32).hex().encode('ascii'))
+            os.link(tmp_path, path)
+        except FileExistsError:
+            pass
+        finally:
+            os.unlink(tmp_path)
+    with open(path, 'rb') as f:
+        return f.read().strip()
+
+
+def account_key(email, password):
+    # Sessions are keyed by both credentials so a warm session is never handed
+    # to someone who only knows the email address. The key is also stored (with
+    # snapshots and job keys), so it is an HMAC under a server-side secret
+    # rather than a plain hash that could be brute-forced offline.
+    return hmac.new(_secret(), f'{email}\0{password}'.encode('utf-8'), hashlib.sha256).hexdigest()
+
+
+def _process_tree_rss(pid):
+    # Resident memory (bytes) of pid and all of its descendants, read from /proc.
+    # Returns 0 where /proc is unavailable.
+    if not pid or not os.path.isdir('/proc'):
+        return 0
+    children = {}
+    rss_pages = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                stat = f.read()
+        except OSError:
+            continue
+        fields = stat[stat.rfind(')') + 2:].split()
+        children.setdefault(int(fields[1]), []).append(int(entry))
+        rss_pages[int(entry)] = int(fields[21])
+    total = 0
+    stack = [pid]
+    while stack:
+        current = stack.pop()
+        total += rss_pages.get(current, 0)
+        stack.extend(children.get(current, []))
+    return total * os.sysconf('SC_PAGE_SIZE')
+
+
+class DriverSlots:
+    # Host-wide cap on live browsers, shared by every worker process. Each live
+    # driver holds an exclusive flock on one of count slot files; the kernel
+    # drops the lock if its process dies, so a crashed worker never leaks a slot.
+
+    def __init__(self, directory, count):
+        self.directory = directory
+        self.count = count
+        os.makedirs(directory, exist_ok=True)
+
+    def try_acquire(self):
+        for i in range(self.count):
+            f = open(os.path.join(self.directory, f'slot-{i}.lock'), 'a')
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                f.close()
+                continue
+            return f
+        return None
+
+    def release(self, slot):
+        try:
+            fcntl.flock(slot, fcntl.LOCK_UN)
+        finally:
+            slot.close()
+
+    def wait(self):
+        # Marks this process as waiting for a slot until passed to release():
+        # waiters share a lock on waiters.lock, which others_waiting() probes.
+        f = open(os.path.join(self.directory, 'waiters.lock'), 'a')
+        fcntl.flock(f, fcntl.LOCK_SH)
+        return f
+
+    def others_waiting(self):
+        with open(os.path.join(self.directory, 'waiters.lock'), 'a') as f:
+            try:
+                fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                return True
+            fcntl.flock(f, fcntl.LOCK_UN)
+            return False
+
+
+class PooledDriver:
+    def __init__(self, key, driver, slot=None):
+        self.key = key
+        self.driver = driver
+        self.slot = slot
+        self.uses = 0
+        self.logged_in = False
+        self.broken = False
+        self.last_used = time.monotonic()
+
+    def rss(self):
+        service = getattr(self.driver, 'service', None)
+        process = getattr(service, 'process', None)
+        return _process_tree_rss(getattr(process, 'pid', None))
+
+
+class DriverPool:
+    # With slots set, max_size applies to the whole host rather than this
+    # process: a worker that finds every slot taken by other workers marks
+    # itself waiting and polls until one frees up. Idle sessions are reaped in
+    # the background, and while another worker waits, one idle session per
+    # poll is quit so no worker sits on slots the others need.
+    SLOT_POLL_SECONDS = 1.0
+    REAP_INTERVAL_SECONDS = 30
+
+    def __init__(self, create_driver, login, is_logged_in, max_size=2, max_uses=50,
+                 max_rss_mb=1024, max_idle_seconds=900, acquire_timeout=300, slots=None, is_broken=None):
+        self.create_driver = create_driver
+        self.login = login
+        self.is_logged_in = is_logged_in
+        self.max_size = max_size
+        self.max_uses = max_uses
+        self.max_rss_bytes = max_rss_mb * 1024 * 1024
+        self.max_idle_seconds = max_idle_seconds
+        self.acquire_timeout = acquire_timeout
+        self.slots = slots
+        # is_broken(exception) decides whether an error raised under a lease
+        # means the browser itself is unusable; by default any error does.
+        self.is_broken = is_broken or (lambda error: True)
+        self._cond = threading.Condition()
+        self._idle = {}
+        self._size = 0
+        self._reaper_pid = None
+        self.launches = 0
+
+    @contextmanager
+    def lease(self, email, password, progress=None):
+        entry = self._acquire(account_key(email, password))
+        try:
+            if not entry.logged_in or not self.is_logged_in(entry.driver):
+                if progress:
+                    progress('logging in')
+                self.login(entry.driver, email, password)
+                entry.logged_in = True
+            yield entry.driver
+        except BaseException as e:
+            entry.broken = not isinstance(e, Exception) or self.is_broken(e)
+            raise
+        finally:
+            self._release(entry)
+
+    def close(self):
+        with self._cond:
+            entries = [entry for idle in self._idle.values() for entry in idle]
+            self._idle.clear()
+            self._size -= len(entries)
+            self._cond.notify_all()
+        for entry in entries:
+            self._quit(entry)
+
+    def _acquire(self, key):
+        deadline = time.monotonic() + self.acquire_timeout
+        evicted = []
+        slot = None
+        waiting = None
+        try:
+            with self._cond:
+                while True:
+                    evicted.extend(self._pop_expired())
+                    idle = self._idle.get(key)
+                    if idle:
+                        entry = idle.pop()
+                        break
+                    if self._size < self.max_size:
+                        slot = self._reuse_slot(evicted) if self.slots else None
+                        if self.slots is None or slot is not None:
+                            self._size += 1
+                            entry = None
+                            break
+                    victim = self._pop_oldest_idle()
+                    if victim is not None:
+                        # Pool is full but another account has a spare session:
+                        # hand its slot over instead of waiting.
+                        slot, victim.slot = victim.slot, None
+                        evicted.append(victim)
+                        entry = None
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout('No browser session became available in time.')
+                    if self.slots and waiting is None:
+                        waiting = self.slots.wait()
+                    # Slots freed by other processes do not notify this condition.
+                    self._cond.wait(min(remaining, self.SLOT_POLL_SECONDS) if self.slots else remaining)
+        finally:
+            if waiting is not None:
+                self.slots.release(waiting)
+            for victim in evicted:
+                self._quit(victim)
+        if entry is not None:
+            return entry
+        try:
+            driver = self.create_driver()
+        except BaseException:
+            if slot is not None:
+                self.slots.release(slot)
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+        self.launches += 1
+        self._start_reaper()
+        return PooledDriver(key, driver, slot)
+
+    def _release(self, entry):
+        entry.uses += 1
+        entry.last_used = time.monotonic()
+        retire = (entry.broken
+                  or entry.uses >= self.max_uses
+                  or (self.max_rss_bytes and entry.rss() > self.max_rss_bytes))
+        with self._cond:
+            if retire:
+                self._size -= 1
+            else:
+                self._idle.setdefault(entry.key, []).append(entry)
+            self._cond.notify()
+        if retire:
+            self._quit(entry)
+
+    def _pop_expired(self):
+        # Caller holds the lock. Expired sessions leave the count immediately;
+        # their slots are freed once they are quit.
+        now = time.monotonic()
+        expired = []
+        for key in list(self._idle):
+            keep = []
+            for entry in self._idle[key]:
+                if now - entry.last_used > self.max_idle_seconds:
+                    expired.append(entry)
+                else:
+                    keep.append(entry)
+            if keep:
+                self._idle[key] = keep
+            else:
+                del self._idle[key]
+        self._size -= len(expired)
+        return expired
+
+    def _reuse_slot(self, evicted):
+        # Caller holds the lock. An expired session of this process still holds
+        # its slot until it is quit, so take that over before looking for a free one.
+        for entry in evicted:
+            if entry.slot is not None:
+                slot, entry.slot = entry.slot, None
+                return slot
+        return self.slots.try_acquire()
+
+    def _pop_oldest_idle(self):
+        # Caller holds the lock. The slot stays counted and is reused by the caller.
+        oldest = None
+        for idle in self._idle.values():
+            for entry in idle:
+                if oldest is None or entry.last_used < oldest.last_used:
+                    oldest = entry
+        if oldest is None:
+            return None
+        self._idle[oldest.key].remove(oldest)
+        if not self._idle[oldest.key]:
+            del self._idle[oldest.key]
+        return oldest
+
+    def _start_reaper(self):
+        # Started from the first launch rather than at construction, so a
+        # preforking server never forks with the thread already running.
+        with self._cond:
+            if self._reaper_pid == os.getpid():
+                return
+            self._reaper_pid = os.getpid()
+        threading.Thread(target=self._reap, daemon=True, name='driver-reaper').start()
+
+    def _reap(self):
+        while True:
+            time.sleep(self.SLOT_POLL_SECONDS if self.slots else self.REAP_INTERVAL_SECONDS)
+            with self._cond:
+                expired = self._pop_expired()
+                if not expired and self.slots and self._idle and self.slots.others_waiting():
+                    # Another worker needs a slot this one only keeps warm.
+                    expired.append(self._pop_oldest_idle())
+                    self._size -= 1
+                if expired:
+                    self._cond.notify_all()
+            for entry in expired:
+                self._quit(entry)
+
+    def _quit(self, entry):
+        try:
+            entry.driver.quit()
+        except Exception:
+            pass
+        finally:
+            if entry.slot is not None:
+                self.slots.release(entry.slot)
+                entry.slot = None
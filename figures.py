@@ -0,0 +1,126 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.subplots import make_subplots
+
+from instrumentation import inc, span
+
+# Above this many points a series is drawn with WebGL and downsampled to the
+# pixel budget: roughly one point per horizontal pixel of the 1200px figures.
+WEBGL_THRESHOLD = int(os.environ.get('FIGURE_WEBGL_THRESHOLD', 1000))
+PIXEL_BUDGET = int(os.environ.get('FIGURE_PIXEL_BUDGET', 1200))
+FIGURE_CACHE_SIZE = int(os.environ.get('FIGURE_CACHE_SIZE', 64))
+
+_figure_cache = OrderedDict()
+_figure_cache_lock = threading.Lock()
+
+
+def content_hash(*parts):
+    # Stable hash of DataFrames (values, column names and dtypes) and plain values.
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, dict):
+            for key in sorted(part):
+                digest.update(repr(key).encode('utf-8'))
+                digest.update(content_hash(part[key]).encode('utf-8'))
+        elif isinstance(part, pd.DataFrame):
+            digest.update(repr(list(zip(part.columns, part.dtypes.astype(str)))).encode('utf-8'))
+            digest.update(pd.util.hash_pandas_object(part, index=False).values.tobytes())
+        else:
+            digest.update(repr(part).encode('utf-8'))
+    return digest.hexdigest()
+
+
+def cached_figure(kind, data, build):
+    # Returns build(data) as a plain figure dict, reusing the result for data
+    # with identical content. Dicts skip plotly's validation when Dash
+    # serializes them, so a hit costs only the hash.
+    key = content_hash(kind, data)
+    with _figure_cache_lock:
+        if key in _figure_cache:
+            _figure_cache.move_to_end(key)
+            inc('figure_cache_requests_total', kind=kind, result='hit')
+            return _figure_cache[key]
+    inc('figure_cache_requests_total', kind=kind, result='miss')
+    with span('figure.build', kind=kind):
+        figure = build(data).to_dict()
+    with _figure_cache_lock:
+        _figure_cache[key] = figure
+        while len(_figure_cache) > FIGURE_CACHE_SIZE:
+            _figure_cache.popitem(last=False)
+    return figure
+
+
+def lttb(x, y, threshold):
+    # Largest-Triangle-Three-Buckets: keeps the first and last points and, for
+    # each bucket in between, the point forming the largest triangle with the
+    # previously kept point and the average of the next bucket.
+    n = len(x)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+    xs = np.asarray(x, dtype='float64')
+    ys = np.asarray(y, dtype='float64')
+    edges = np.linspace(1, n - 1, threshold - 1).astype(np.int64)
+    kept = np.empty(threshold, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = n - 1
+    previous = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        next_start, next_end = end, edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = xs[next_start:next_end].mean()
+        avg_y = ys[next_start:next_end].mean()
+        area = np.abs((xs[previous] - avg_x) * (ys[start:end] - ys[previous])
+                      - (xs[previous] - xs[start:end]) * (avg_y - ys[previous]))
+        previous = start + int(np.argmax(area))
+        kept[i + 1] = previous
+    return kept
+
+
+def line_trace(x, y, name, mode='lines+markers'):
+    # go.Scatter for short series; downsampled go.Scattergl for long ones.
+    x = pd.Series(x).reset_index(drop=True)
+    y = pd.Series(y).reset_index(drop=True)
+    if len(x) <= WEBGL_THRESHOLD:
+        return go.Scatter(x=x, y=y, mode=mode, name=name)
+    numeric_x = x.astype('int64') if pd.api.types.is_datetime64_any_dtype(x) else x
+    kept = lttb(numeric_x.to_numpy(), y.fillna(0).to_numpy(), PIXEL_BUDGET)
+    return go.Scattergl(x=x.iloc[kept], y=y.iloc[kept], mode='lines', name=name)
+
+
+METRIC_LABELS = {
+    'newUsers': 'New Users',
+    'activeUsers': 'Returning Users',
+    'eventCount': 'Key Events',
+    'totalUsers': 'Users',
+    'sessions': 'Sessions',
+}
+
+
+def build_ga_figure(df):
+    fig = make_subplots(rows=5, cols=1,
+                        subplot_titles=('New Users', 'Returning Users', 'Key Events', 'Users', 'Sessions'),
+                        vertical_spacing=0.1)
+
+    fig.add_trace(line_trace(df['date'], df['newUsers'], 'New Users'), row=1, col=1)
+    fig.update_yaxes(title_text='New Users', row=1, col=1, range=[0, df['newUsers'].max() + 5])
+
+    fig.add_trace(line_trace(df['date'], df['activeUsers'], 'Returning Users'), row=2, col=1)
+    fig.update_yaxes(title_text='Returning Users', row=2, col=1, range=[0, df['activeUsers'].max() + 5])
+
+    fig.add_trace(line_trace(df['date'], df['eventCount'], 'Key Events'), row=3, col=1)
+    fig.update_yaxes(title_text='Key Events', row=3, col=1, range=[0, df['eventCount'].max() + 5])
+
+    fig.add_trace(line_trace(df['date'], df['totalUsers'], 'Users'), row=4, col=1)
+    fig.update_yaxes(title_text='Users', row=4, col=1, range=[0, df['totalUsers'].max() + 5])
+
+    fig.add_trace(line_trace(df['date'], df['sessions'], 'Sessions'), row=5, col=1)
+    fig.update_yaxes(title_text='Sessions', row=5, col=1, range=[0, df['sessions'].max() + 5])
+
+    fig.update_layout(height=1500, width=1200, title_text="Google Analytics Data")
+    return fig
@@ -0,0 +1,138 @@
+import fcntl
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import timedelta
+
+import pandas as pd
+
+from instrumentation import inc
+
+# Bumped whenever the cached frame layout changes so old entries are not mixed in.
+KEY_VERSION = 2
+
+
+class ReportCache:
+    # Disk-backed cache of GA report frames. Entries survive restarts, expire
+    # after ttl_seconds and are evicted least-recently-used first once the
+    # directory holds more than max_entries files or max_bytes.
+    #
+    # Reports with a 'date' dimension are refreshed incrementally: days older
+    # than refresh_days are considered closed and served from the cache, and
+    # only the newest days are requested again.
+
+    def __init__(self, directory, ttl_seconds=900, max_entries=256, max_bytes=256 * 1024 * 1024, refresh_days=2):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.refresh_days = refresh_days
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def key(self, property_id, dimensions, metrics, date_range):
+        payload = json.dumps([KEY_VERSION, property_id, list(dimensions), list(metrics), list(date_range)])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get_report(self, property_id, dimensions, metrics, date_range, start_date, end_date, fetch, max_age=None):
+        # date_range is the request as written (e.g. ('30daysAgo', 'today')) and is
+        # what the entry is keyed by; start_date/end_date are the concrete dates it
+        # resolves to today. fetch(start, end) takes ISO dates and returns a frame.
+        # max_age (seconds) overrides ttl_seconds for this call; 0 always refreshes,
+        # still incrementally.
+        key = self.key(property_id, dimensions, metrics, date_range)
+        entry = self._load(key)
+        if self._fresh(entry, end_date, max_age):
+            inc('ga_cache_requests_total', result='hit')
+            return entry['frame'].copy()
+
+        # One fetch per key at a time across all worker processes: whoever waits
+        # on the lock re-reads the entry the holder just wrote.
+        with self._key_lock(key):
+            entry = self._load(key)
+            if self._fresh(entry, end_date, max_age):
+                inc('ga_cache_requests_total', result='hit')
+                return entry['frame'].copy()
+            return self._refresh(key, entry, dimensions, start_date, end_date, fetch)
+
+    def _fresh(self, entry, end_date, max_age=None):
+        max_age = self.ttl_seconds if max_age is None else max_age
+        return entry is not None and time.time() - entry['fetched_at'] < max_age \
+            and entry['end'] == end_date
+
+    @contextmanager
+    def _key_lock(self, key):
+        with open(os.path.join(self.directory, key + '.lock'), 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _refresh(self, key, entry, dimensions, start_date, end_date, fetch):
+        now = time.time()
+        if entry is not None and 'date' in dimensions and not entry['frame'].empty \
+                and entry['start'] <= start_date:
+            # Days that were still open when the entry was fetched need fetching again.
+            refresh_from = max(start_date, entry['end'] - timedelta(days=max(self.refresh_days, 1) - 1))
+            inc('ga_cache_requests_total', result='incremental')
+            fresh = fetch(refresh_from.isoformat(), end_date.isoformat())
+            closed = entry['frame'][(entry['frame']['date'] >= start_date.isoformat())
+                                    & (entry['frame']['date'] < refresh_from.isoformat())]
+            frame = pd.concat([closed, fresh], ignore_index=True) if not fresh.empty else closed.reset_index(drop=True)
+        else:
+            inc('ga_cache_requests_total', result='miss')
+            frame = fetch(start_date.isoformat(), end_date.isoformat())
+
+        self._store(key, {'fetched_at': now, 'start': start_date, 'end': end_date, 'frame': frame})
+        return frame.copy()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def _load(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                entry = pickle.load(f)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            return None
+        # Reads count as use for LRU eviction.
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return entry
+
+    def _store(self, key, entry):
+        with self._lock:
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(entry, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self._path(key))
+            self._evict()
+
+    def _evict(self):
+        files = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.pkl'):
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except OSError:
+                    # Evicted by another worker in the meantime.
+                    continue
+                files.append((stat.st_mtime, stat.st_size, name))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        while files and (len(files) > self.max_entries or total > self.max_bytes):
+            _, size, name = files.pop(0)
+            total -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                pass
@@ -1,11 +1,54 @@
 from google.oauth2 import service_account
 from google.analytics.data_v1beta import BetaAnalyticsDataClient
-from google.analytics.data_v1beta.types import RunReportRequest
+from google.analytics.data_v1beta.types import RunReportRequest, BatchRunReportsRequest, MetricType
+from ga_cache import ReportCache
+from instrumentation import inc, instrumented, span
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+import numpy as np
 import pandas as pd
 import os
+import threading
 
+PROPERTY_ID = 'properties/401993563'  # Replace with your actual GA4 property ID
+DATE_RANGE = ('30daysAgo', 'today')
+DIMENSIONS = ['date']
+METRICS = [
+    'newUsers',
+    'activeUsers',  # Replace with the correct metric name for Returning Users if different
+    'eventCount',  # Assuming 'Key events' refers to event count
+    'totalUsers',  # Assuming 'Users' refers to total users
+    'sessions'  # Include sessions
+]
+
+report_cache = ReportCache(
+    os.environ.get('GA_CACHE_DIR', os.path.join(os.path.dirname(__file__), '.cache', 'ga')),
+    ttl_seconds=int(os.environ.get('GA_CACHE_TTL', 900)),
+    max_entries=int(os.environ.get('GA_CACHE_MAX_ENTRIES', 256)),
+    max_bytes=int(os.environ.get('GA_CACHE_MAX_MB', 256)) * 1024 * 1024,
+    refresh_days=int(os.environ.get('GA_CACHE_REFRESH_DAYS', 2)),
+)
+
+# GA allows at most this many reports per batchRunReports call.
+MAX_BATCH_REPORTS = 5
+MAX_CONCURRENT_REQUESTS = int(os.environ.get('GA_MAX_CONCURRENT_REQUESTS', 8))
+# Rows requested per runReport page (the API caps this at 250,000).
+PAGE_SIZE = int(os.environ.get('GA_PAGE_SIZE', 100000))
+
+DATE_DIMENSION_FORMATS = {
+    'date': '%Y%m%d',
+    'dateHour': '%Y%m%d%H',
+    'dateHourMinute': '%Y%m%d%H%M',
+    'firstSessionDate': '%Y%m%d',
+}
+INTEGER_METRIC_TYPES = (MetricType.TYPE_INTEGER,)
+
+_client = None
+_client_lock = threading.Lock()
+
+@instrumented('ga.client_init')
 def initialize_analyticsreporting():
-    client_secrets_path = os.path.join(os.path.dirname(__file__), 'client_secret.json')
+    client_secrets_path = os.environ.get('GA_CLIENT_SECRET', os.path.join(os.path.dirname(__file__), 'client_secret.json'))
     
     credentials = service_account.Credentials.from_service_account_file(
         client_secrets_path
@@ -13,42 +56,159 @@ def initialize_analyticsreporting():
     client = BetaAnalyticsDataClient(credentials=credentials)
     return client
 
-def get_report(client):
-    request = RunReportRequest(
-        property='properties/401993563',  # Replace with your actual GA4 property ID
-        date_ranges=[{'start_date': '30daysAgo', 'end_date': 'today'}],
-        dimensions=[{'name': 'date'}],
-        metrics=[
-            {'name': 'newUsers'},
-            {'name': 'activeUsers'},  # Replace with the correct metric name for Returning Users if different
-            {'name': 'eventCount'},  # Assuming 'Key events' refers to event count
-            {'name': 'totalUsers'},  # Assuming 'Users' refers to total users
-            {'name': 'sessions'}  # Include sessions
-        ]
+def get_client():
+    # One client (and gRPC channel) per process. The service-account
+    # credentials refresh their access token on the channel as it expires.
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = initialize_analyticsreporting()
+    return _client
+
+def set_client(client):
+    # Replaces the shared client, e.g. with replay.FakeAnalyticsClient.
+    global _client
+    with _client_lock:
+        _client = client
+
+def get_report(client, start_date=DATE_RANGE[0], end_date=DATE_RANGE[1],
+               property_id=PROPERTY_ID, dimensions=DIMENSIONS, metrics=METRICS):
+    request = build_request({'property_id': property_id, 'date_range': (start_date, end_date),
+                             'dimensions': dimensions, 'metrics': metrics})
+    return read_report(client, request)
+
+def build_request(definition, include_property=True):
+    start_date, end_date = definition.get('date_range', DATE_RANGE)
+    return RunReportRequest(
+        property=definition.get('property_id', PROPERTY_ID) if include_property else '',
+        date_ranges=[{'start_date': start_date, 'end_date': end_date}],
+        dimensions=[{'name': name} for name in definition.get('dimensions', DIMENSIONS)],
+        metrics=[{'name': name} for name in definition.get('metrics', METRICS)],
+        limit=PAGE_SIZE
     )
-    response = client.run_report(request)
-    return response
 
-def print_response(response):
-    dimension_headers = [header.name for header in response.dimension_headers]
-    metric_headers = [header.name for header in response.metric_headers]
-
-    data = []
-    for row in response.rows:
-        row_data = {}
-        for header, dimension_value in zip(dimension_headers, row.dimension_values):
-            row_data[header] = dimension_value.value
-        for header, metric_value in zip(metric_headers, row.metric_values):
-            row_data[header] = metric_value.value
-        data.append(row_data)
-
-    df = pd.DataFrame(data)
-    df['date'] = pd.to_datetime(df['date']).dt.strftime('%Y-%m-%d')
-     
-    return df
+def run_reports(definitions, client=None):
+    # Runs many report definitions (dicts with property_id, dimensions, metrics
+    # and date_range) on the shared client. Definitions for the same property
+    # are grouped into batchRunReports calls of up to five reports, and the
+    # batches are sent concurrently. Returns one DataFrame per definition, in order.
+    client = client or get_client()
+    by_property = {}
+    for index, definition in enumerate(definitions):
+        by_property.setdefault(definition.get('property_id', PROPERTY_ID), []).append(index)
+
+    batches = []
+    for property_id, indexes in by_property.items():
+        for start in range(0, len(indexes), MAX_BATCH_REPORTS):
+            batches.append((property_id, indexes[start:start + MAX_BATCH_REPORTS]))
 
-def fetch_google_analytics_data():
-    client = initialize_analyticsreporting()
-    response = get_report(client)
-    df = print_response(response)
+    def run_batch(batch):
+        property_id, indexes = batch
+        request = BatchRunReportsRequest(
+            property=property_id,
+            requests=[build_request(definitions[index], include_property=False) for index in indexes]
+        )
+        with span('ga.fetch_batch'):
+            response = client.batch_run_reports(request)
+        inc('ga_api_requests_total', method='batch_run_reports')
+        frames = []
+        for index, report in zip(indexes, response.reports):
+            if len(report.rows) < report.row_count:
+                # Batched reports come back one page at a time; read the rest separately.
+                frames.append(read_report(client, build_request(definitions[index])))
+            else:
+                frames.append(response_to_frame(report))
+        return indexes, frames
+
+    frames = [None] * len(definitions)
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_CONCURRENT_REQUESTS, len(batches)))) as executor:
+        for indexes, batch_frames in executor.map(run_batch, batches):
+            for index, frame in zip(indexes, batch_frames):
+                frames[index] = frame
+    return frames
+
+def resolve_date(value, today):
+    if value == 'today':
+        return today
+    if value == 'yesterday':
+        return today - timedelta(days=1)
+    if value.endswith('daysAgo'):
+        return today - timedelta(days=int(value[:-len('daysAgo')]))
+    return date.fromisoformat(value)
+
+def iter_report_pages(client, request, page_size=PAGE_SIZE):
+    offset = 0
+    while True:
+        request.limit = page_size
+        request.offset = offset
+        with span('ga.fetch'):
+            response = client.run_report(request)
+        inc('ga_api_requests_total', method='run_report')
+        yield response
+        offset += len(response.rows)
+        if not response.rows or offset >= response.row_count:
+            break
+
+@instrumented('ga.parse')
+def response_to_frame(response, categorical=True):
+    # Builds typed columns straight from the protobuf rows: date dimensions are
+    # parsed to datetimes, other dimensions become categoricals and metrics are
+    # int64 or float64 according to their declared type.
+    raw = type(response).pb(response)
+    rows = raw.rows
+    columns = {}
+    for index, header in enumerate(raw.dimension_headers):
+        values = np.array([row.dimension_values[index].value for row in rows], dtype=object)
+        if header.name in DATE_DIMENSION_FORMATS:
+            columns[header.name] = pd.to_datetime(values, format=DATE_DIMENSION_FORMATS[header.name])
+        elif categorical:
+            columns[header.name] = pd.Categorical(values)
+        else:
+            columns[header.name] = values
+    for index, header in enumerate(raw.metric_headers):
+        values = np.array([row.metric_values[index].value for row in rows], dtype=str)
+        dtype = np.int64 if header.type_ in INTEGER_METRIC_TYPES else np.float64
+        columns[header.name] = values.astype(dtype) if len(values) else np.array([], dtype=dtype)
+    return pd.DataFrame(columns)
+
+def read_report(client, request, chunks=False, page_size=PAGE_SIZE):
+    # Reads every page of a report. With chunks=True yields one DataFrame per
+    # page; otherwise the pages are concatenated once at the end.
+    pages = (response_to_frame(response, categorical=chunks)
+             for response in iter_report_pages(client, request, page_size))
+    if chunks:
+        return pages
+    frames = list(pages)
+    df = pd.concat(frames, ignore_index=True) if len(frames) > 1 else frames[0]
+    for column in df.columns:
+        if df[column].dtype == object:
+            df[column] = df[column].astype('category')
     return df
+
+def print_response(response):
+    return response_to_frame(response)
+
+def fetch_google_analytics_data(property_id=PROPERTY_ID, dimensions=DIMENSIONS, metrics=METRICS, date_range=DATE_RANGE,
+                                max_age=None):
+    # max_age=0 bypasses the report cache's TTL, e.g. for scheduled refreshes.
+    def fetch(start_date, end_date):
+        return get_report(get_client(), start_date, end_date, property_id, dimensions, metrics)
+
+    today = date.today()
+    return report_cache.get_report(property_id, dimensions, metrics, date_range,
+                                   resolve_date(date_range[0], today), resolve_date(date_range[1], today), fetch,
+                                   max_age=max_age)
+
+def fetch_google_analytics_reports(definitions):
+    # Cached counterpart of run_reports: each definition goes through the report
+    # cache, and the misses are fetched concurrently over the shared channel.
+    def fetch_one(definition):
+        return fetch_google_analytics_data(
+            definition.get('property_id', PROPERTY_ID), definition.get('dimensions', DIMENSIONS),
+            definition.get('metrics', METRICS), tuple(definition.get('date_range', DATE_RANGE)))
+
+    if not definitions:
+        return []
+    with ThreadPoolExecutor(max_workers=max(1, min(MAX_CONCURRENT_REQUESTS, len(definitions)))) as executor:
+        return list(executor.map(fetch_one, definitions))
@@ -0,0 +1,36 @@
+import multiprocessing
+import os
+import subprocess
+import sys
+
+# Production server: gunicorn --config gunicorn.conf.py wsgi:server
+bind = f"0.0.0.0:{os.environ.get('PORT', '8050')}"
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+# The app is imported once in the master and forked, so workers share its
+# pages in memory. Nothing at import starts a thread or opens a browser or
+# GA client; connections and pools are created lazily in each worker.
+preload_app = True
+# The first GA load on an empty store waits for the API.
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+graceful_timeout = 30
+accesslog = '-'
+
+# The scheduled refresher (refresher.py) runs as one sidecar process next to
+# the workers, started once the master is ready and stopped with it.
+_refresher = None
+
+def when_ready(server):
+    global _refresher
+    if os.environ.get('REFRESH_GA_PROPERTIES') or os.environ.get('REFRESH_HULU_CAMPAIGNS'):
+        _refresher = subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'refresher.py')])
+        server.log.info('Started refresher (pid %s)', _refresher.pid)
+
+def on_exit(server):
+    if _refresher is not None and _refresher.poll() is None:
+        _refresher.terminate()
+        try:
+            _refresher.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            _refresher.kill()
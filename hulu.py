@@ -1,6 +1,4 @@
-import dash
 from dash import dcc, html
-from dash.dependencies import Input, Output, State
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
@@ -9,48 +7,59 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.common.keys import Keys
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
-import time
-
-# Adding external stylesheet for custom styling
-external_stylesheets = ['https://stackpath.bootstrapcdn.com/bootstrap/4.5.2/css/bootstrap.min.css']
-app = dash.Dash(__name__, external_stylesheets=external_stylesheets)
-app.config.suppress_callback_exceptions = True
-
-app.layout = html.Div(children=[
-    html.Nav(className='navbar navbar-expand-lg', children=[
-        html.A(className='navbar-brand', href='/', children=[
-            html.Img(src='/assets/logo_footer.webp', id='logo')
-        ]),
-        html.Button(className='navbar-toggler', type='button', **{
-            'data-toggle': 'collapse', 'data-target': '#navbarNav', 'aria-controls': 'navbarNav', 'aria-expanded': 'false', 'aria-label': 'Toggle navigation'
-        }, children=[
-            html.Span(className='navbar-toggler-icon')
-        ])
-    ]),
-    html.Div(className='container mt-4', children=[
-        dcc.Loading(id="loading-icon", children=[
-            html.Div(id='form-or-graph', children=[
-                html.Div(id='form-container', children=[
-                    html.H2('Enter your Hulu Credentials and Campaign URL', className='mb-4'),
-                    html.Div(className="form-group", children=[
-                        html.Label("Email:", htmlFor="email"),
-                        dcc.Input(id='email', type='email', placeholder='Enter your email', className='form-control', required=True)
-                    ]),
-                    html.Div(className="form-group", children=[
-                        html.Label("Password:", htmlFor="password"),
-                        dcc.Input(id='password', type='password', placeholder='Enter your password', className='form-control', required=True)
-                    ]),
-                    html.Div(className="form-group", children=[
-                        html.Label("Campaign URL:", htmlFor="campaign-url"),
-                        dcc.Input(id='campaign-url', type='text', placeholder='Enter Hulu campaign URL', className='form-control', required=True)
-                    ]),
-                    html.Button('Submit', id='submit-button', n_clicks=0, className='btn btn-primary btn-block'),
-                ])
-            ])
-        ], type='default')
-    ])
-])
+from selenium.common.exceptions import TimeoutException, NoSuchElementException, WebDriverException
+from driver_pool import DriverPool, DriverSlots, PoolTimeout, account_key
+from metrics_store import metrics_store
+from table_schemas import parse_table
+from figures import cached_figure, line_trace
+from instrumentation import inc, instrumented, span
+from concurrent.futures import ThreadPoolExecutor
+import hulu_api
+import atexit
+import logging
+import os
+
+logger = logging.getLogger(__name__)
+
+LOGIN_URL = os.environ.get('HULU_LOGIN_URL', 'https://admanager.hulu.com/login')
+
+# How long each phase may take and what "ready" means for it. Waits poll at
+# poll_interval and return as soon as the condition holds, so latency is set
+# by the site rather than by fixed sleeps.
+READINESS = {
+    'poll_interval': float(os.environ.get('HULU_POLL_INTERVAL', 0.2)),
+    'login_page_timeout': float(os.environ.get('HULU_LOGIN_PAGE_TIMEOUT', 30)),
+    'login_timeout': float(os.environ.get('HULU_LOGIN_TIMEOUT', 30)),
+    'report_timeout': float(os.environ.get('HULU_REPORT_TIMEOUT', 60)),
+    # Optional signals that the login went through, besides leaving the login page.
+    'post_login_url': os.environ.get('HULU_POST_LOGIN_URL'),
+    'session_cookie': os.environ.get('HULU_SESSION_COOKIE'),
+    # Daily, audiences, platforms and content genres tables on the campaign page.
+    'report_tables': (0, 3, 4, 5),
+    'campaign_list_timeout': float(os.environ.get('HULU_CAMPAIGN_LIST_TIMEOUT', 30)),
+}
+
+# Campaigns scraped at once in batch mode; each one holds a pooled driver.
+MAX_PARALLEL_CAMPAIGNS = int(os.environ.get('HULU_MAX_PARALLEL_CAMPAIGNS', os.environ.get('HULU_POOL_SIZE', 2)))
+
+# Collects the header and cell text of every table on the page in a single
+# WebDriver round trip instead of one per row and per cell.
+EXTRACT_TABLES_JS = """
+return Array.from(document.querySelectorAll('table')).map(function (table) {
+    return {
+        headers: Array.from(table.querySelectorAll('th')).map(function (th) { return th.innerText.trim(); }),
+        rows: Array.from(table.querySelectorAll('tr')).map(function (tr) {
+            return Array.from(tr.querySelectorAll('td')).map(function (td) { return td.innerText.trim(); });
+        }).filter(function (cols) { return cols.length > 0; })
+    };
+});
+"""
+
+def table_frame(headers, data):
+    if headers and data:
+        return pd.DataFrame(data, columns=headers)
+    else:
+        return pd.DataFrame()
 
 def extract_table_data(table):
     headers = table.find_elements(By.TAG_NAME, 'th')
@@ -64,125 +73,361 @@ def extract_table_data(table):
         if cols:
             data.append(cols)
 
-    if headers and data:
-        return pd.DataFrame(data, columns=headers)
-    else:
-        return pd.DataFrame()
+    return table_frame(headers, data)
 
-def extract_category_names(categories):
-    return [category.split('|')[-1].strip() for category in categories]
+@instrumented('hulu.extract')
+def extract_all_tables(driver):
+    tables = driver.execute_script(EXTRACT_TABLES_JS) or []
+    return [table_frame(table['headers'], table['rows']) for table in tables]
 
-def scrape_campaign_data(email, password, campaign_url):
+CAMPAIGN_LINKS_JS = """
+return Array.from(document.querySelectorAll('a[href*="/campaigns/"]')).map(function (a) { return a.href; });
+"""
+
+COUNT_TABLE_ROWS_JS = """
+return Array.from(document.querySelectorAll('table')).map(function (table) {
+    return table.querySelectorAll('tr > td').length;
+});
+"""
+
+class ScrapeError(Exception):
+    pass
+
+def create_driver():
     options = webdriver.FirefoxOptions()
     options.add_argument('--headless')  # Run Firefox in headless mode
-    options.add_argument('--headless')
     options.add_argument('--disable-gpu')
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
-    
-    driver = webdriver.Firefox(options=options)
-    graphs = []
+    with span('hulu.launch'):
+        driver = webdriver.Firefox(options=options)
+    inc('hulu_driver_launches_total')
+    return driver
+
+def is_login_page(driver):
+    return '/login' in driver.current_url
+
+def is_broken(error):
+    # Pooled sessions are retired on browser and session failures only; a
+    # ScrapeError (bad campaign URL, slow report page) or a missing element
+    # leaves a working, logged-in browser behind.
+    return isinstance(error, WebDriverException) and not isinstance(error, (TimeoutException, NoSuchElementException))
+
+def is_logged_in(driver):
+    # Cheap check before reusing a pooled session; an expiry that only shows up
+    # on navigation is handled in open_campaign.
+    return not is_login_page(driver) and bool(driver.get_cookies())
+
+def wait(driver, timeout, readiness=READINESS):
+    return WebDriverWait(driver, timeout, poll_frequency=readiness['poll_interval'])
+
+def login_completed(readiness=READINESS):
+    def condition(driver):
+        if readiness['session_cookie'] and driver.get_cookie(readiness['session_cookie']):
+            return True
+        if readiness['post_login_url']:
+            return readiness['post_login_url'] in driver.current_url
+        return not is_login_page(driver)
+    return condition
+
+LOGIN_REQUIRED = 'login-required'
+
+def report_tables_populated(readiness=READINESS):
+    required = readiness['report_tables']
+
+    def condition(driver):
+        if is_login_page(driver):
+            return LOGIN_REQUIRED
+        counts = driver.execute_script(COUNT_TABLE_ROWS_JS) or []
+        return len(counts) > max(required) and all(counts[index] > 0 for index in required)
+    return condition
+
+@instrumented('hulu.login')
+def login(driver, email, password, readiness=READINESS):
+    driver.get(LOGIN_URL)
+
     try:
-        driver.get('https://admanager.hulu.com/login')
+        wait(driver, readiness['login_page_timeout'], readiness).until(EC.presence_of_element_located((By.NAME, 'email')))
+    except TimeoutException:
+        raise ScrapeError("Login page took too long to load.")
 
-        try:
-            WebDriverWait(driver, 100).until(EC.presence_of_element_located((By.NAME, 'email')))
-        except TimeoutException:
-            return "Error: Login page took too long to load."
-        
-        username = driver.find_element(By.NAME, 'email')
-        pwd = driver.find_element(By.NAME, 'password')
+    username = driver.find_element(By.NAME, 'email')
+    pwd = driver.find_element(By.NAME, 'password')
 
-        username.send_keys(email)
-        pwd.send_keys(password)
-        pwd.send_keys(Keys.RETURN)
+    username.send_keys(email)
+    pwd.send_keys(password)
+    pwd.send_keys(Keys.RETURN)
 
-        time.sleep(5)
+    try:
+        wait(driver, readiness['login_timeout'], readiness).until(login_completed(readiness))
+    except TimeoutException:
+        raise ScrapeError("Login did not complete. Please check your credentials.")
+
+def wait_for_report(driver, readiness=READINESS):
+    try:
+        return wait(driver, readiness['report_timeout'], readiness).until(report_tables_populated(readiness))
+    except TimeoutException:
+        # Some campaigns legitimately have empty breakdown tables; go ahead with
+        # whatever rendered as long as there is at least one table.
+        if driver.find_elements(By.TAG_NAME, 'table'):
+            return True
+        raise ScrapeError("Campaign data page took too long to load.")
 
+@instrumented('hulu.load')
+def open_campaign(driver, email, password, campaign_url, readiness=READINESS):
+    driver.get(campaign_url)
+    if wait_for_report(driver, readiness) == LOGIN_REQUIRED:
+        # The pooled session expired since it was last used.
+        login(driver, email, password, readiness)
         driver.get(campaign_url)
+        if wait_for_report(driver, readiness) == LOGIN_REQUIRED:
+            raise ScrapeError("Hulu redirected to the login page again after signing in.")
 
-        time.sleep(5)
+@instrumented('hulu.discover')
+def discover_campaign_urls(driver, email, password, campaign_list_url, readiness=READINESS):
+    driver.get(campaign_list_url)
+    if is_login_page(driver):
+        login(driver, email, password, readiness)
+        driver.get(campaign_list_url)
+    try:
+        links = wait(driver, readiness['campaign_list_timeout'], readiness).until(
+            lambda d: d.execute_script(CAMPAIGN_LINKS_JS))
+    except TimeoutException:
+        raise ScrapeError("No campaigns were found on the campaign list page.")
+    return list(dict.fromkeys(link.split('#')[0] for link in links))
 
-        try:
-            tables = WebDriverWait(driver, 100).until(
-                EC.presence_of_all_elements_located((By.TAG_NAME, 'table'))
-            )
-        except TimeoutException:
-            return "Error: Campaign data page took too long to load."
-
-        fig = make_subplots(rows=4, cols=1, 
-                            subplot_titles=('Total Impressions Over Time', 'Impressions by Audiences', 'Impressions by Platforms', 'Impressions by Content Genres'),
-                            vertical_spacing=0.1)
-
-        if len(tables) > 0:
-            df = extract_table_data(tables[0])
-            if not df.empty:
-                df['Total Impressions'] = df['Total Impressions'].str.replace(' impressions', '').str.replace(',', '').astype(int)
-                if 'Days' in df.columns:
-                    df['Start Date'] = df['Days'].str.split(' - ').str[0]
-                    df['Start Date'] = pd.to_datetime(df['Start Date'], format='%a, %m/%d/%y')
-                    fig.add_trace(go.Scatter(x=df['Start Date'], y=df['Total Impressions'], mode='lines+markers', name='Total Impressions'), row=1, col=1)
-                    fig.update_yaxes(title_text='Total Impressions', row=1, col=1)
-
-        if len(tables) > 3:
-            df = extract_table_data(tables[3])
-            if not df.empty:
-                df['Audiences'] = extract_category_names(df['Audiences'])
-                df['Impressions'] = df['Impressions'].str.replace(' impressions', '').str.replace(',', '').astype(int)
-                fig.add_trace(go.Bar(x=df['Impressions'], y=df['Audiences'], orientation='h', name='Impressions by Audiences'), row=2, col=1)
-                fig.update_yaxes(title_text='Audiences', row=2, col=1)
-
-        if len(tables) > 4:
-            df = extract_table_data(tables[4])
-            if not df.empty:
-                df['Impressions'] = df['Impressions'].str.replace(' impressions', '').str.replace(',', '').astype(int)
-                fig.add_trace(go.Bar(x=df['Platforms'], y=df['Impressions'], name='Impressions by Platforms'), row=3, col=1)
-                fig.update_yaxes(title_text='Impressions', row=3, col=1)
-
-        if len(tables) > 5:
-            df = extract_table_data(tables[5])
-            if not df.empty:
-                df['Impressions'] = df['Impressions'].apply(lambda x: int(x.replace(' impressions', '').replace(',', '')) if x.replace(' impressions', '').replace(',', '').isdigit() else 0)
-                fig.add_trace(go.Bar(x=df['Content Genres'], y=df['Impressions'], name='Impressions by Content Genres'), row=4, col=1)
-                fig.update_yaxes(title_text='Impressions', row=4, col=1)
-
-        fig.update_layout(height=1500, width=1200, title_text="Hulu Campaign Data Visualization")
-        graphs.append(dcc.Graph(figure=fig))
-
-    except NoSuchElementException as e:
+# HULU_POOL_SIZE caps live browsers across every worker process on the host.
+HULU_POOL_SIZE = int(os.environ.get('HULU_POOL_SIZE', 2))
+HULU_POOL_SLOTS_DIR = os.environ.get(
+    'HULU_POOL_SLOTS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'driver-slots'))
+driver_pool = DriverPool(
+    create_driver, login, is_logged_in,
+    max_size=HULU_POOL_SIZE,
+    max_uses=int(os.environ.get('HULU_POOL_MAX_USES', 50)),
+    max_rss_mb=int(os.environ.get('HULU_POOL_MAX_RSS_MB', 1024)),
+    max_idle_seconds=int(os.environ.get('HULU_POOL_IDLE_SECONDS', 900)),
+    acquire_timeout=int(os.environ.get('HULU_POOL_WAIT_SECONDS', 300)),
+    slots=DriverSlots(HULU_POOL_SLOTS_DIR, HULU_POOL_SIZE),
+    is_broken=is_broken,
+)
+atexit.register(driver_pool.close)
+
+# Campaign page tables by position, and the schema each one is parsed with.
+CAMPAIGN_TABLES = {
+    0: ('daily', 'hulu_daily'),
+    3: ('audiences', 'hulu_audiences'),
+    4: ('platforms', 'hulu_platforms'),
+    5: ('content_genres', 'hulu_content_genres'),
+}
+
+@instrumented('hulu.parse')
+def normalize_campaign_tables(table_frames):
+    # Turns the raw page tables into {'daily': [day, impressions],
+    # 'audiences' / 'platforms' / 'content_genres': [label, impressions]},
+    # plus 'errors' listing any cells that could not be parsed.
+    campaign = {name: pd.DataFrame(columns=['label', 'impressions']) for name in ('audiences', 'platforms', 'content_genres')}
+    campaign['daily'] = pd.DataFrame(columns=['day', 'impressions'])
+    errors = []
+    for index, (name, schema_name) in CAMPAIGN_TABLES.items():
+        if len(table_frames) > index and not table_frames[index].empty:
+            campaign[name], table_errors = parse_table(table_frames[index], schema_name)
+            errors.append(table_errors.assign(table=name))
+    campaign['errors'] = pd.concat(errors, ignore_index=True) if errors else pd.DataFrame(columns=['row', 'column', 'value', 'table'])
+    return campaign
+
+def parse_errors_alert(errors):
+    if errors.empty:
+        return None
+    return html.Div(className='alert alert-warning', children=[
+        html.P(f'{len(errors)} cells could not be parsed and their rows were left out:'),
+        html.Ul([html.Li(f"{row.table} / {row.column}: " + ('column missing, table left out' if pd.isna(row.row) else repr(row.value)))
+                 for row in errors.head(10).itertuples()])
+    ])
+
+def build_campaign_figure(campaign):
+    fig = make_subplots(rows=4, cols=1, 
+                        subplot_titles=('Total Impressions Over Time', 'Impressions by Audiences', 'Impressions by Platforms', 'Impressions by Content Genres'),
+                        vertical_spacing=0.1)
+
+    df = campaign['daily']
+    if not df.empty:
+        fig.add_trace(line_trace(df['day'], df['impressions'], 'Total Impressions'), row=1, col=1)
+        fig.update_yaxes(title_text='Total Impressions', row=1, col=1)
+
+    df = campaign['audiences']
+    if not df.empty:
+        fig.add_trace(go.Bar(x=df['impressions'], y=df['label'], orientation='h', name='Impressions by Audiences'), row=2, col=1)
+        fig.update_yaxes(title_text='Audiences', row=2, col=1)
+
+    df = campaign['platforms']
+    if not df.empty:
+        fig.add_trace(go.Bar(x=df['label'], y=df['impressions'], name='Impressions by Platforms'), row=3, col=1)
+        fig.update_yaxes(title_text='Impressions', row=3, col=1)
+
+    df = campaign['content_genres']
+    if not df.empty:
+        fig.add_trace(go.Bar(x=df['label'], y=df['impressions'], name='Impressions by Content Genres'), row=4, col=1)
+        fig.update_yaxes(title_text='Impressions', row=4, col=1)
+
+    fig.update_layout(height=1500, width=1200, title_text="Hulu Campaign Data Visualization")
+    return fig
+
+def campaign_figure(campaign):
+    return cached_figure('hulu-campaign', campaign, build_campaign_figure)
+
+PHASES = ('queued', 'launching', 'logging in', 'loading', 'parsing', 'rendering')
+
+def describe_error(e):
+    inc('scrape_errors_total', error=type(e).__name__)
+    if isinstance(e, ScrapeError):
+        return f"Error: {e}"
+    if isinstance(e, PoolTimeout):
+        return "Error: All browser sessions are busy, please try again shortly."
+    if isinstance(e, NoSuchElementException):
         return f"Error: Unable to locate an element. Details: {e}"
+    return f"An error occurred: {e}"
+
+def remember_api_session(email, password, driver):
+    return hulu_api.sessions.remember(account_key(email, password), driver.get_cookies(),
+                                      driver.execute_script('return navigator.userAgent'))
+
+def fetch_campaign_tables_api(email, password, campaign_url, progress):
+    # Reads the report JSON over plain HTTP with the cookies of a browser
+    # login, which a pooled driver only has to provide once per session.
+    # Returns None when that fails so the caller renders the page instead.
+    key = account_key(email, password)
+    session = hulu_api.sessions.get(key)
+    if session is None:
+        progress('launching')
+        with driver_pool.lease(email, password, progress) as driver:
+            session = remember_api_session(email, password, driver)
+    progress('loading')
+    try:
+        return hulu_api.fetch_campaign_tables(session, campaign_url)
+    except Exception as e:
+        # Only a rejected session is dropped; a bad URL or a server error for
+        # one campaign leaves the account's cookies to the next campaign.
+        if isinstance(e, hulu_api.SessionExpired):
+            hulu_api.sessions.forget(key)
+        inc('hulu_api_fallbacks_total', error=type(e).__name__)
+        logger.warning('Report API failed for %s, falling back to the browser: %s', campaign_url, e)
+        return None
+
+def scrape_campaign_tables(email, password, campaign_url, progress=None):
+    progress = progress or (lambda phase: None)
+    if hulu_api.REPORT_URL:
+        tables = fetch_campaign_tables_api(email, password, campaign_url, progress)
+        if tables is not None:
+            return tables
+    progress('launching')
+    # Only the browser work happens under the lease so the session goes
+    # back to the pool before parsing and plotting.
+    with driver_pool.lease(email, password, progress) as driver:
+        progress('loading')
+        open_campaign(driver, email, password, campaign_url)
+        if hulu_api.REPORT_URL:
+            # A fresh login may just have happened; let the next report skip the page.
+            remember_api_session(email, password, driver)
+        return extract_all_tables(driver)
+
+def refresh_campaign(email, password, campaign_url, progress=None):
+    # Scrapes one campaign into the metrics store and returns its normalized tables.
+    progress = progress or (lambda phase: None)
+    table_frames = scrape_campaign_tables(email, password, campaign_url, progress)
+    progress('parsing')
+    campaign = normalize_campaign_tables(table_frames)
+    metrics_store.ingest_hulu_campaign(campaign_url, account_key(email, password), campaign)
+    return campaign
+
+def scrape_campaign_data(email, password, campaign_url, progress=None):
+    progress = progress or (lambda phase: None)
+    graphs = []
+    try:
+        campaign = refresh_campaign(email, password, campaign_url, progress)
+        progress('rendering')
+        graphs.append(dcc.Graph(figure=campaign_figure(metrics_store.hulu_campaign(campaign_url))))
+        alert = parse_errors_alert(campaign['errors'])
+        if alert:
+            graphs.append(alert)
+
     except Exception as e:
-        return f"An error occurred: {e}"
-    finally:
-        driver.quit()
+        return describe_error(e)
     return graphs
 
-@app.callback(
-    Output('form-or-graph', 'children'),
-    [Input('submit-button', 'n_clicks')],
-    [State('email', 'value'), State('password', 'value'), State('campaign-url', 'value')]
-)
-def update_graph(n_clicks, email, password, campaign_url):
-    if n_clicks > 0 and email and password and campaign_url:
-        graphs = scrape_campaign_data(email, password, campaign_url)
-        return graphs
-    return html.Div(id='form-container', children=[
-        html.H2('Enter your Hulu Credentials and Campaign URL', className='mb-4'),
-        html.Div(className="form-group", children=[
-            html.Label("Email:", htmlFor="email"),
-            dcc.Input(id='email', type='email', placeholder='Enter your email', className='form-control', required=True)
-        ]),
-        html.Div(className="form-group", children=[
-            html.Label("Password:", htmlFor="password"),
-            dcc.Input(id='password', type='password', placeholder='Enter your password', className='form-control', required=True)
-        ]),
-        html.Div(className="form-group", children=[
-            html.Label("Campaign URL:", htmlFor="campaign-url"),
-            dcc.Input(id='campaign-url', type='text', placeholder='Enter Hulu campaign URL', className='form-control', required=True)
-        ]),
-        html.Button('Submit', id='submit-button', n_clicks=0, className='btn btn-primary btn-block'),
-    ], style={'max-width': '500px', 'margin': '0 auto', 'padding-top': '50px'})
-
-
-if __name__ == '__main__':
-    app.run_server(debug=True, host="0.0.0.0", port="8050")
+def stored_campaign_graphs(email, password, campaign_url):
+    # Last stored snapshot of a campaign, only for the account that scraped it.
+    if metrics_store.hulu_last_ingested(campaign_url, account_key(email, password)) is None:
+        return None
+    return campaign_graphs(campaign_url)
+
+def campaign_graphs(campaign_url):
+    # Callers check access first: stored_campaign_graphs, or a finished scrape job for the campaign.
+    return [dcc.Graph(figure=campaign_figure(metrics_store.hulu_campaign(campaign_url)))]
+
+def scrape_campaigns(email, password, campaign_urls, max_parallel=MAX_PARALLEL_CAMPAIGNS, progress=None):
+    # Scrapes many campaigns with at most max_parallel browsers at a time.
+    # Returns {url: normalized campaign} for successes and {url: message} for failures,
+    # so one broken campaign never sinks the batch.
+    progress = progress or (lambda phase: None)
+    results, errors = {}, {}
+    if not campaign_urls:
+        return results, errors
+
+    def scrape(url):
+        try:
+            results[url] = refresh_campaign(email, password, url)
+        except Exception as e:
+            errors[url] = describe_error(e)
+        progress(f'loading ({len(results) + len(errors)}/{len(campaign_urls)} campaigns)')
+
+    progress(f'loading (0/{len(campaign_urls)} campaigns)')
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(campaign_urls)))) as executor:
+        list(executor.map(scrape, campaign_urls))
+    return results, errors
+
+def build_comparison_figure(results):
+    fig = make_subplots(rows=2, cols=1,
+                        subplot_titles=('Total Impressions Over Time by Campaign', 'Total Impressions by Campaign'),
+                        vertical_spacing=0.15)
+    totals = {}
+    for url, campaign in results.items():
+        name = url.rstrip('/').split('/')[-1]
+        df = campaign['daily']
+        if df.empty:
+            continue
+        totals[name] = int(df['impressions'].sum())
+        fig.add_trace(line_trace(df['day'], df['impressions'], name), row=1, col=1)
+    fig.add_trace(go.Bar(x=list(totals), y=list(totals.values()), name='Total Impressions', showlegend=False), row=2, col=1)
+    fig.update_yaxes(title_text='Total Impressions', row=1, col=1)
+    fig.update_yaxes(title_text='Total Impressions', row=2, col=1)
+    fig.update_layout(height=1200, width=1200, title_text="Hulu Campaign Comparison")
+    return fig
+
+def scrape_campaigns_data(email, password, campaign_urls, campaign_list_url=None, progress=None):
+    progress = progress or (lambda phase: None)
+    campaign_urls = list(campaign_urls)
+    try:
+        if campaign_list_url:
+            progress('launching')
+            with driver_pool.lease(email, password, progress) as driver:
+                progress('loading')
+                campaign_urls += discover_campaign_urls(driver, email, password, campaign_list_url)
+        campaign_urls = list(dict.fromkeys(campaign_urls))
+        if not campaign_urls:
+            return "Error: No campaign URLs were given or found."
+
+        results, errors = scrape_campaigns(email, password, campaign_urls, progress=progress)
+
+        progress('parsing')
+        fig = cached_figure('hulu-comparison', results, build_comparison_figure)
+        progress('rendering')
+    except Exception as e:
+        return describe_error(e)
+
+    graphs = [dcc.Graph(figure=fig)]
+    if errors:
+        graphs.append(html.Div(className='alert alert-warning', children=[
+            html.P(f'{len(errors)} of {len(campaign_urls)} campaigns could not be loaded:'),
+            html.Ul([html.Li(f'{url}: {message}') for url, message in errors.items()])
+        ]))
+    return graphs
@@ -0,0 +1,123 @@
+import os
+import threading
+import time
+from urllib.parse import urlparse
+
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+
+from instrumentation import inc, span
+
+# The JSON endpoint the Ad Manager campaign page loads its report from, with
+# {origin} and {campaign_id} filled in from the campaign page URL, e.g.
+# '{origin}/api/campaigns/{campaign_id}/report'. Unset disables the fast path
+# and every campaign is read from the rendered page.
+REPORT_URL = os.environ.get('HULU_API_REPORT_URL')
+TIMEOUT = float(os.environ.get('HULU_API_TIMEOUT', 15))
+# Captured browser cookies are reused for this long before logging in again.
+SESSION_SECONDS = int(os.environ.get('HULU_API_SESSION_SECONDS', 1800))
+POOL_SIZE = int(os.environ.get('HULU_API_POOL_SIZE', 10))
+
+# Report sections by page table position, with the page's column headers.
+# Rows come either as lists in header order or as objects keyed by header,
+# and go through the same schemas as the scraped tables.
+REPORT_SECTIONS = {
+    0: ('daily', ['Days', 'Total Impressions']),
+    3: ('audiences', ['Audiences', 'Impressions']),
+    4: ('platforms', ['Platforms', 'Impressions']),
+    5: ('content_genres', ['Content Genres', 'Impressions']),
+}
+
+
+class SessionExpired(Exception):
+    pass
+
+
+class UnexpectedReport(Exception):
+    pass
+
+
+class ApiSessions:
+    # requests.Session per account, carrying the cookies of a browser login.
+    # Each keeps its own connection pool, so repeated reports for an account
+    # reuse TCP and TLS connections. Held in process memory only: cookies are
+    # credentials and are never written to disk.
+
+    def __init__(self, ttl_seconds=SESSION_SECONDS, pool_size=POOL_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.pool_size = pool_size
+        self._lock = threading.Lock()
+        self._sessions = {}
+
+    def remember(self, key, cookies, user_agent=None):
+        # cookies as returned by WebDriver.get_cookies().
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount('https://', adapter)
+        session.mount('http://', adapter)
+        for cookie in cookies:
+            session.cookies.set(cookie['name'], cookie['value'],
+                                domain=cookie.get('domain', ''), path=cookie.get('path', '/'))
+        if user_agent:
+            session.headers['User-Agent'] = user_agent
+        with self._lock:
+            previous = self._sessions.pop(key, None)
+            self._sessions[key] = (session, time.monotonic())
+        if previous:
+            previous[0].close()
+        return session
+
+    def get(self, key):
+        with self._lock:
+            entry = self._sessions.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry[1] > self.ttl_seconds:
+                del self._sessions[key]
+                entry[0].close()
+                return None
+            return entry[0]
+
+    def forget(self, key):
+        with self._lock:
+            entry = self._sessions.pop(key, None)
+        if entry:
+            entry[0].close()
+
+
+sessions = ApiSessions()
+
+
+def report_url(campaign_url):
+    parsed = urlparse(campaign_url)
+    campaign_id = parsed.path.rstrip('/').split('/')[-1]
+    return REPORT_URL.format(origin=f'{parsed.scheme}://{parsed.netloc}', campaign_id=campaign_id)
+
+
+def report_tables(payload):
+    # Lays the report sections out like the page's tables, so
+    # hulu.normalize_campaign_tables handles both paths alike. Raises
+    # UnexpectedReport when the payload has none of the sections, e.g. when
+    # REPORT_URL points at an endpoint of another shape.
+    if not isinstance(payload, dict) or not any(name in payload for name, _ in REPORT_SECTIONS.values()):
+        raise UnexpectedReport('Report has none of the expected sections.')
+    tables = [pd.DataFrame() for _ in range(max(REPORT_SECTIONS) + 1)]
+    for index, (name, headers) in REPORT_SECTIONS.items():
+        rows = payload.get(name) or []
+        if rows:
+            tables[index] = pd.DataFrame.from_records(rows, columns=headers)
+    return tables
+
+
+def fetch_campaign_tables(session, campaign_url):
+    # Raises SessionExpired when the endpoint wants a fresh login and
+    # UnexpectedReport when the response is not a campaign report.
+    inc('hulu_api_requests_total')
+    with span('hulu.api'):
+        response = session.get(report_url(campaign_url), timeout=TIMEOUT, allow_redirects=False,
+                               headers={'Accept': 'application/json', 'X-Requested-With': 'XMLHttpRequest'})
+        if response.status_code in (401, 403) or response.is_redirect:
+            raise SessionExpired(f'Report endpoint answered {response.status_code}.')
+        response.raise_for_status()
+        return report_tables(response.json())
@@ -0,0 +1,171 @@
+import collections
+import functools
+import logging
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger('timing')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, float('inf'))
+# Requests slower than this many seconds get their sampled stacks logged; unset disables the profiler.
+PROFILE_SLOW_SECONDS = float(os.environ['PROFILE_SLOW_SECONDS']) if os.environ.get('PROFILE_SLOW_SECONDS') else None
+PROFILE_INTERVAL = float(os.environ.get('PROFILE_INTERVAL', 0.01))
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    escaped = ((key, str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')) for key, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for key, value in escaped) + '}'
+
+
+class Registry:
+    # In-process counters and duration histograms, rendered in the Prometheus
+    # text exposition format.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = collections.defaultdict(float)
+        self.histograms = {}
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self.counters[key] += amount
+
+    def observe(self, name, seconds, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [[0] * len(DURATION_BUCKETS), 0.0, 0]
+            for i, bound in enumerate(DURATION_BUCKETS):
+                if seconds <= bound:
+                    histogram[0][i] += 1
+            histogram[1] += seconds
+            histogram[2] += 1
+
+    def render(self):
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, ([*buckets], total, count)) for key, (buckets, total, count) in self.histograms.items())
+        seen = set()
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{_labels(labels)} {value:g}')
+        for (name, labels), (buckets, total, count) in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f'# TYPE {name} histogram')
+            for bound, bucket_count in zip(DURATION_BUCKETS, buckets):
+                le = '+Inf' if bound == float('inf') else f'{bound:g}'
+                lines.append(f'{name}_bucket{_labels(labels + (("le", le),))} {bucket_count}')
+            lines.append(f'{name}_sum{_labels(labels)} {total:.6f}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def inc(name, amount=1, **labels):
+    registry.inc(name, amount, **labels)
+
+
+@contextmanager
+def span(phase, **labels):
+    # Times one phase into phase_duration_seconds{phase=...} and logs it as a
+    # structured record; exceptions are counted in errors_total before re-raising.
+    start = time.perf_counter()
+    status = 'ok'
+    try:
+        yield
+    except BaseException:
+        status = 'error'
+        inc('errors_total', phase=phase, **labels)
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        registry.observe('phase_duration_seconds', seconds, phase=phase, **labels)
+        logger.info('span phase=%s status=%s seconds=%.3f', phase, status, seconds,
+                    extra={'phase': phase, 'status': status, 'seconds': seconds, **labels})
+
+
+class _Sampler:
+    # Samples one thread's Python stack at a fixed interval from a helper thread.
+
+    def __init__(self, thread_id, interval):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = collections.Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True, name='sampler')
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(f'{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}:{frame.f_lineno}')
+                frame = frame.f_back
+            if stack:
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stop.set()
+        self._thread.join()
+
+
+def instrumented(name):
+    # Decorator for Dash callbacks: a span per call, plus stack sampling whose
+    # hottest stacks are logged when the call exceeds PROFILE_SLOW_SECONDS.
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if PROFILE_SLOW_SECONDS is None:
+                with span(name):
+                    return func(*args, **kwargs)
+            start = time.perf_counter()
+            with _Sampler(threading.get_ident(), PROFILE_INTERVAL) as sampler, span(name):
+                try:
+                    return func(*args, **kwargs)
+                finally:
+                    seconds = time.perf_counter() - start
+                    if seconds > PROFILE_SLOW_SECONDS:
+                        top = '\n'.join(f'{count:6d} {stack}' for stack, count in sampler.stacks.most_common(15))
+                        logger.warning('slow call %s took %.2fs; hottest sampled stacks:\n%s', name, seconds, top)
+        return wrapper
+    return decorate
+
+
+def register_metrics(server):
+    # Adds GET /metrics to the Flask server behind Dash and times every request.
+    from flask import Response, g, request
+
+    @server.before_request
+    def start_timer():
+        g.request_start = time.perf_counter()
+
+    @server.after_request
+    def record_request(response):
+        start = getattr(g, 'request_start', None)
+        if start is not None and request.path != '/metrics':
+            # Labelled by route pattern, not raw path, so labels stay bounded.
+            path = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            registry.observe('http_request_duration_seconds', time.perf_counter() - start, path=path)
+            inc('http_requests_total', path=path, status=str(response.status_code))
+        return response
+
+    @server.route('/metrics')
+    def metrics():
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
@@ -0,0 +1,147 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from plotly.utils import PlotlyJSONEncoder
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    phase TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    pid INTEGER NOT NULL,
+    updated REAL NOT NULL,
+    subject TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_key_status ON jobs (key, status);
+"""
+
+WORKER_EXITED = 'The worker running this job exited.'
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class Job:
+    def __init__(self, id, key, status, phase, result, error, pid, updated, subject):
+        self.id = id
+        self.key = key
+        self.status = status
+        self.phase = phase
+        self.result = json.loads(result) if result is not None else None
+        self.error = error
+        self.pid = pid
+        self.updated = updated
+        # What the job is about (e.g. a campaign URL), readable by whoever holds its id.
+        self.subject = subject
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'failed')
+
+
+class JobQueue:
+    # Background jobs whose status lives in SQLite, so every worker process
+    # sees every job: a poll can land on any worker, and identical requests
+    # submitted to different workers share one job. Each job runs on a bounded
+    # thread pool in the process that created it; results are stored as JSON
+    # (Dash components serialize the same way they do over the wire).
+
+    def __init__(self, path, max_workers=2, retention_seconds=3600):
+        self.path = path
+        self.max_workers = max_workers
+        self.retention_seconds = retention_seconds
+        self._local = threading.local()
+        self._executor = None
+        self._executor_pid = None
+        self._lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+            if 'subject' not in [row[1] for row in conn.execute('PRAGMA table_info(jobs)')]:
+                conn.execute('ALTER TABLE jobs ADD COLUMN subject TEXT')
+
+    def _connection(self):
+        # Connections are per thread and never reused across a fork.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _executor_for_process(self):
+        with self._lock:
+            if self._executor is None or self._executor_pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='job')
+                self._executor_pid = os.getpid()
+            return self._executor
+
+    def submit(self, key, func, *args, subject=None):
+        # Identical requests that are still queued or running share one job.
+        key = hashlib.sha256(json.dumps(key, default=str).encode('utf-8')).hexdigest()
+        conn = self._connection()
+        now = time.time()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute("DELETE FROM jobs WHERE status IN ('done', 'failed') AND updated < ?",
+                         (now - self.retention_seconds,))
+            for job_id, pid in conn.execute(
+                    "SELECT id, pid FROM jobs WHERE key = ? AND status IN ('queued', 'running')", (key,)).fetchall():
+                if _pid_alive(pid):
+                    conn.execute('COMMIT')
+                    return job_id
+                # The worker that owned it died; let this request start over.
+                conn.execute("UPDATE jobs SET status = 'failed', error = ?, updated = ? WHERE id = ?",
+                             (WORKER_EXITED, now, job_id))
+            job_id = uuid.uuid4().hex
+            conn.execute('INSERT INTO jobs VALUES (?, ?, ?, ?, NULL, NULL, ?, ?, ?)',
+                         (job_id, key, 'queued', 'queued', os.getpid(), now, subject))
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+        self._executor_for_process().submit(self._run, job_id, func, args)
+        return job_id
+
+    def get(self, job_id):
+        row = self._connection().execute(
+            'SELECT id, key, status, phase, result, error, pid, updated, subject FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = Job(*row)
+        if not job.finished and not _pid_alive(job.pid):
+            job.status = 'failed'
+            job.error = WORKER_EXITED
+        return job
+
+    def _update(self, job_id, **fields):
+        fields['updated'] = time.time()
+        assignments = ', '.join(f'{name} = ?' for name in fields)
+        self._connection().execute(f'UPDATE jobs SET {assignments} WHERE id = ?', (*fields.values(), job_id))
+
+    def _run(self, job_id, func, args):
+        self._update(job_id, status='running')
+        try:
+            result = func(*args, progress=lambda phase: self._update(job_id, phase=phase))
+            self._update(job_id, status='done', result=json.dumps(result, cls=PlotlyJSONEncoder))
+        except Exception as e:
+            self._update(job_id, status='failed', error=str(e))
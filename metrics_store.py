@@ -0,0 +1,198 @@
+import os
+import sqlite3
+import threading
+import time
+
+import pandas as pd
+
+from figures import content_hash
+from table_schemas import parse_table
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ga_daily (
+    property_id TEXT NOT NULL,
+    date TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL,
+    ingested_at REAL NOT NULL,
+    PRIMARY KEY (property_id, date, metric)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS hulu_campaigns (
+    campaign_url TEXT NOT NULL,
+    account TEXT NOT NULL,
+    ingested_at REAL NOT NULL,
+    PRIMARY KEY (campaign_url, account)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS hulu_daily (
+    campaign_url TEXT NOT NULL,
+    day TEXT NOT NULL,
+    impressions INTEGER,
+    ingested_at REAL NOT NULL,
+    PRIMARY KEY (campaign_url, day)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS hulu_breakdown (
+    campaign_url TEXT NOT NULL,
+    dimension TEXT NOT NULL,
+    ingested_at REAL NOT NULL,
+    label TEXT NOT NULL,
+    impressions INTEGER,
+    PRIMARY KEY (campaign_url, dimension, ingested_at, label)
+) WITHOUT ROWID;
+
+CREATE TABLE IF NOT EXISTS source_versions (
+    source TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    version INTEGER NOT NULL,
+    changed_at REAL NOT NULL,
+    checked_at REAL NOT NULL
+) WITHOUT ROWID;
+"""
+
+HULU_BREAKDOWNS = ('audiences', 'platforms', 'content_genres')
+
+
+class MetricsStore:
+    # Embedded SQLite store of normalized GA daily metrics and Hulu campaign
+    # tables. Every row carries its ingest time; Hulu breakdowns keep one
+    # snapshot per scrape. Primary keys lead with the source and date so
+    # date-range filters are index range scans.
+    #
+    # Each source ('ga:<property>', 'hulu:<campaign url>') also has a version
+    # that is bumped only when an ingest's normalized tables differ from the
+    # previous one, so dashboards can poll it and re-render on real changes.
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connection() as conn:
+            conn.executescript(SCHEMA)
+
+    def _connection(self):
+        # Per thread, and reopened after a fork: a preloading WSGI master opens
+        # one at import, and SQLite connections must not cross process boundaries.
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def ingest_ga_daily(self, property_id, df, ingested_at=None):
+        if df.empty:
+            return 0
+        ingested_at = ingested_at or time.time()
+        df, _ = parse_table(df, 'ga_daily')
+        long = df.assign(date=df['date'].dt.strftime('%Y-%m-%d')).melt(
+            id_vars='date', var_name='metric', value_name='value')
+        rows = [(property_id, date, metric, None if pd.isna(value) else float(value), ingested_at)
+                for date, metric, value in long.itertuples(index=False)]
+        with self._connection() as conn:
+            conn.executemany('INSERT OR REPLACE INTO ga_daily VALUES (?, ?, ?, ?, ?)', rows)
+            self._record_fingerprint(conn, f'ga:{property_id}', content_hash(df), ingested_at)
+        return len(rows)
+
+    def ga_daily(self, property_id, metrics=None, start_date=None, end_date=None):
+        query = 'SELECT date, metric, value FROM ga_daily WHERE property_id = ?'
+        params = [property_id]
+        if start_date is not None:
+            query += ' AND date >= ?'
+            params.append(str(start_date))
+        if end_date is not None:
+            query += ' AND date <= ?'
+            params.append(str(end_date))
+        if metrics:
+            query += f' AND metric IN ({", ".join("?" * len(metrics))})'
+            params.extend(metrics)
+        long = pd.read_sql_query(query, self._connection(), params=params)
+        if long.empty:
+            return pd.DataFrame(columns=['date'] + list(metrics or []))
+        df = long.pivot(index='date', columns='metric', values='value').reset_index()
+        df.columns.name = None
+        df['date'] = pd.to_datetime(df['date'])
+        return df[['date'] + [metric for metric in (metrics or df.columns[1:]) if metric in df.columns]]
+
+    def ga_last_ingested(self, property_id):
+        row = self._connection().execute(
+            'SELECT MAX(ingested_at) FROM ga_daily WHERE property_id = ?', (property_id,)).fetchone()
+        return row[0]
+
+    def ingest_hulu_campaign(self, campaign_url, account, campaign, ingested_at=None):
+        # campaign is the normalized dict produced by hulu.normalize_campaign_tables.
+        ingested_at = ingested_at or time.time()
+        daily = campaign.get('daily', pd.DataFrame())
+        fingerprint = content_hash({name: campaign.get(name, pd.DataFrame()) for name in ('daily',) + HULU_BREAKDOWNS})
+        with self._connection() as conn:
+            conn.execute('INSERT OR REPLACE INTO hulu_campaigns VALUES (?, ?, ?)',
+                         (campaign_url, account, ingested_at))
+            if not self._record_fingerprint(conn, f'hulu:{campaign_url}', fingerprint, ingested_at):
+                # Same tables as last time: no new breakdown snapshot.
+                return False
+            if not daily.empty:
+                conn.executemany(
+                    'INSERT OR REPLACE INTO hulu_daily VALUES (?, ?, ?, ?)',
+                    [(campaign_url, day.strftime('%Y-%m-%d'), int(impressions), ingested_at)
+                     for day, impressions in zip(daily['day'], daily['impressions'])])
+            for dimension in HULU_BREAKDOWNS:
+                df = campaign.get(dimension, pd.DataFrame())
+                if not df.empty:
+                    conn.executemany(
+                        'INSERT INTO hulu_breakdown VALUES (?, ?, ?, ?, ?)',
+                        [(campaign_url, dimension, ingested_at, str(label), int(impressions))
+                         for label, impressions in zip(df['label'], df['impressions'])])
+        return True
+
+    def _record_fingerprint(self, conn, source, fingerprint, checked_at):
+        # Returns True, and bumps the source's version, when the fingerprint changed.
+        row = conn.execute('SELECT fingerprint FROM source_versions WHERE source = ?', (source,)).fetchone()
+        if row is not None and row[0] == fingerprint:
+            conn.execute('UPDATE source_versions SET checked_at = ? WHERE source = ?', (checked_at, source))
+            return False
+        conn.execute('INSERT INTO source_versions VALUES (?, ?, 1, ?, ?)'
+                     ' ON CONFLICT (source) DO UPDATE SET fingerprint = excluded.fingerprint,'
+                     ' version = version + 1, changed_at = excluded.changed_at, checked_at = excluded.checked_at',
+                     (source, fingerprint, checked_at, checked_at))
+        return True
+
+    def source_version(self, source):
+        row = self._connection().execute(
+            'SELECT version FROM source_versions WHERE source = ?', (source,)).fetchone()
+        return row[0] if row else 0
+
+    def hulu_last_ingested(self, campaign_url, account):
+        row = self._connection().execute(
+            'SELECT ingested_at FROM hulu_campaigns WHERE campaign_url = ? AND account = ?',
+            (campaign_url, account)).fetchone()
+        return row[0] if row else None
+
+    def hulu_campaign(self, campaign_url, start_date=None, end_date=None):
+        query = 'SELECT day, impressions FROM hulu_daily WHERE campaign_url = ?'
+        params = [campaign_url]
+        if start_date is not None:
+            query += ' AND day >= ?'
+            params.append(str(start_date))
+        if end_date is not None:
+            query += ' AND day <= ?'
+            params.append(str(end_date))
+        conn = self._connection()
+        daily = pd.read_sql_query(query + ' ORDER BY day', conn, params=params)
+        daily['day'] = pd.to_datetime(daily['day'])
+        campaign = {'daily': daily}
+        for dimension in HULU_BREAKDOWNS:
+            campaign[dimension] = pd.read_sql_query(
+                'SELECT label, impressions FROM hulu_breakdown'
+                ' WHERE campaign_url = ? AND dimension = ? AND ingested_at = ('
+                '  SELECT MAX(ingested_at) FROM hulu_breakdown WHERE campaign_url = ? AND dimension = ?)',
+                conn, params=[campaign_url, dimension, campaign_url, dimension])
+        return campaign
+
+
+metrics_store = MetricsStore(os.environ.get(
+    'METRICS_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache', 'metrics.sqlite3')))
@@ -0,0 +1,146 @@
+import hashlib
+import heapq
+import logging
+import os
+import random
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# What to keep warm. GA properties are refreshed with the service account;
+# Hulu campaigns with the account given in HULU_REFRESH_EMAIL/PASSWORD.
+REFRESH_GA_PROPERTIES = [p.strip() for p in os.environ.get('REFRESH_GA_PROPERTIES', '').split(',') if p.strip()]
+REFRESH_HULU_CAMPAIGNS = [u.strip() for u in os.environ.get('REFRESH_HULU_CAMPAIGNS', '').split(',') if u.strip()]
+HULU_REFRESH_EMAIL = os.environ.get('HULU_REFRESH_EMAIL')
+HULU_REFRESH_PASSWORD = os.environ.get('HULU_REFRESH_PASSWORD')
+REFRESH_GA_SECONDS = int(os.environ.get('REFRESH_GA_SECONDS', os.environ.get('GA_REFRESH_SECONDS', 900)))
+REFRESH_HULU_SECONDS = int(os.environ.get('REFRESH_HULU_SECONDS', 3600))
+# Refreshes started per minute, per kind of source.
+RATE_LIMITS = {
+    'ga': float(os.environ.get('REFRESH_GA_PER_MINUTE', 10)),
+    'hulu': float(os.environ.get('REFRESH_HULU_PER_MINUTE', 2)),
+}
+# Each run is moved by up to this fraction of its interval so sources never line up again.
+JITTER = 0.1
+
+
+class RateLimiter:
+    # Spaces starts of one kind of refresh at least 60 / per_minute seconds apart.
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute
+        self._lock = threading.Lock()
+        self._next = time.monotonic()
+
+    def wait(self, stop):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + self.interval
+        return not stop.wait(start - now)
+
+
+class Refresher:
+    # Refreshes registered sources on their own intervals. First runs are
+    # spread across each interval by a hash of the source name, so a restart
+    # does not fire everything at once; each run then gets some jitter, and a
+    # failing source backs off up to four intervals. Changes reach open
+    # dashboards through the store's source versions.
+
+    def __init__(self, max_workers=2, rate_limits=RATE_LIMITS):
+        self.limiters = {kind: RateLimiter(per_minute) for kind, per_minute in rate_limits.items()}
+        self.max_workers = max_workers
+        self.sources = {}
+        self._queue = []
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._lock = threading.Lock()
+
+    def register(self, name, kind, interval, refresh):
+        offset = int(hashlib.sha256(name.encode('utf-8')).hexdigest(), 16) % max(int(interval), 1)
+        with self._lock:
+            self.sources[name] = {'kind': kind, 'interval': interval, 'refresh': refresh, 'failures': 0}
+            heapq.heappush(self._queue, (time.monotonic() + offset, name))
+        self._wake.set()
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='refresh') as executor:
+            while not self._stop.is_set():
+                self._wake.clear()
+                with self._lock:
+                    due, name = self._queue[0] if self._queue else (None, None)
+                    if due is not None and due <= time.monotonic():
+                        heapq.heappop(self._queue)
+                    else:
+                        name = None
+                if name is None:
+                    self._wake.wait(None if due is None else due - time.monotonic())
+                    continue
+                executor.submit(self._run_one, name)
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def _run_one(self, name):
+        source = self.sources[name]
+        if not self.limiters[source['kind']].wait(self._stop):
+            return
+        start = time.perf_counter()
+        try:
+            source['refresh']()
+            source['failures'] = 0
+            logger.info('refreshed %s in %.1fs', name, time.perf_counter() - start)
+        except Exception:
+            source['failures'] += 1
+            logger.exception('refreshing %s failed (%d in a row)', name, source['failures'])
+        delay = source['interval'] * min(2 ** source['failures'], 4) * random.uniform(1 - JITTER, 1 + JITTER)
+        with self._lock:
+            heapq.heappush(self._queue, (time.monotonic() + delay, name))
+        self._wake.set()
+
+
+def refresh_ga_property(property_id):
+    from google_analytics import fetch_google_analytics_data
+    from metrics_store import metrics_store
+    # A refresh is due by the schedule, not by the report cache's TTL.
+    metrics_store.ingest_ga_daily(property_id, fetch_google_analytics_data(property_id=property_id, max_age=0))
+
+
+def refresh_hulu_campaign(campaign_url):
+    from hulu import refresh_campaign
+    refresh_campaign(HULU_REFRESH_EMAIL, HULU_REFRESH_PASSWORD, campaign_url)
+
+
+def configured_refresher():
+    refresher = Refresher()
+    for property_id in REFRESH_GA_PROPERTIES:
+        refresher.register(f'ga:{property_id}', 'ga', REFRESH_GA_SECONDS,
+                           lambda property_id=property_id: refresh_ga_property(property_id))
+    if REFRESH_HULU_CAMPAIGNS and not (HULU_REFRESH_EMAIL and HULU_REFRESH_PASSWORD):
+        logger.warning('REFRESH_HULU_CAMPAIGNS is set but HULU_REFRESH_EMAIL/PASSWORD are not; skipping Hulu')
+    elif REFRESH_HULU_CAMPAIGNS:
+        for url in REFRESH_HULU_CAMPAIGNS:
+            refresher.register(f'hulu:{url}', 'hulu', REFRESH_HULU_SECONDS,
+                               lambda url=url: refresh_hulu_campaign(url))
+    return refresher
+
+
+def main():
+    # One refresher per host, run as its own process (gunicorn.conf.py starts
+    # it next to the web workers); dashboards only read what it stores.
+    logging.basicConfig(level=os.environ.get('LOG_LEVEL', 'INFO'), format='%(asctime)s %(levelname)s %(name)s %(message)s')
+    refresher = configured_refresher()
+    if not refresher.sources:
+        logger.info('No sources registered; set REFRESH_GA_PROPERTIES or REFRESH_HULU_CAMPAIGNS.')
+        return
+    signal.signal(signal.SIGTERM, lambda *args: refresher.stop())
+    signal.signal(signal.SIGINT, lambda *args: refresher.stop())
+    refresher.run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,314 @@
+import argparse
+import json
+import os
+import threading
+from datetime import date, timedelta
+from html.parser import HTMLParser
+from http.cookies import SimpleCookie
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from google.analytics.data_v1beta.types import BatchRunReportsResponse, MetricType, RunReportResponse
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+LOGIN_PAGE = """<html><body>
+<form method="post" action="/login">
+    <input name="email" type="email">
+    <input name="password" type="password">
+    <button type="submit">Sign in</button>
+</form>
+</body></html>"""
+
+# Report endpoint served by ReplayServer; point HULU_API_REPORT_URL at
+# '{origin}' + REPORT_PATH to exercise hulu_api against it.
+REPORT_PATH = '/api/campaigns/{campaign_id}/report'
+# Page table positions of the report sections (see hulu_api.REPORT_SECTIONS).
+REPORT_SECTIONS = {0: 'daily', 3: 'audiences', 4: 'platforms', 5: 'content_genres'}
+
+
+# Recording
+
+def record_hulu_page(driver, name, directory=FIXTURES_DIR):
+    # Saves the rendered campaign page the driver is on as <directory>/hulu/<name>.html.
+    path = os.path.join(directory, 'hulu', name + '.html')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(driver.page_source)
+    return path
+
+
+def record_ga_response(response, name, directory=FIXTURES_DIR):
+    path = os.path.join(directory, 'ga', name + '.json')
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(RunReportResponse.to_json(response))
+    return path
+
+
+def load_ga_response(path):
+    with open(path, encoding='utf-8') as f:
+        return RunReportResponse.from_json(f.read())
+
+
+# Synthetic fixtures at a chosen size, for when no recording is at hand
+
+def synthesize_hulu_page(days=30, breakdown_rows=10):
+    def table(headers, rows):
+        head = ''.join(f'<th>{header}</th>' for header in headers)
+        body = ''.join('<tr>' + ''.join(f'<td>{cell}</td>' for cell in row) + '</tr>' for row in rows)
+        return f'<table><thead><tr>{head}</tr></thead><tbody>{body}</tbody></table>'
+
+    first = date(2024, 1, 1)
+    daily = [(f'{(first + timedelta(days=i)):%a, %m/%d/%y} - {(first + timedelta(days=i)):%a, %m/%d/%y}',
+              f'{(i * 7919) % 100000 + 1000:,} impressions') for i in range(days)]
+    breakdown = [(f'Segment {i % 5} | Label {i}', f'{(i * 104729) % 1000000:,} impressions') for i in range(breakdown_rows)]
+    tables = [
+        table(['Days', 'Total Impressions'], daily),
+        table(['Ad', 'Impressions'], [(f'Ad {i}', f'{i:,} impressions') for i in range(breakdown_rows)]),
+        table(['Creative', 'Impressions'], [(f'Creative {i}', f'{i:,} impressions') for i in range(breakdown_rows)]),
+        table(['Audiences', 'Impressions'], breakdown),
+        table(['Platforms', 'Impressions'], [(f'Platform {i}', value) for i, (_, value) in enumerate(breakdown)]),
+        table(['Content Genres', 'Impressions'], [(f'Genre {i}', value) for i, (_, value) in enumerate(breakdown)]),
+    ]
+    return '<html><body>' + ''.join(tables) + '</body></html>'
+
+
+def synthesize_ga_response(days=30, metrics=('newUsers', 'activeUsers', 'eventCount', 'totalUsers', 'sessions')):
+    raw = RunReportResponse.pb()()
+    raw.dimension_headers.add(name='date')
+    for metric in metrics:
+        raw.metric_headers.add(name=metric, type_=MetricType.TYPE_INTEGER)
+    last = date.today()
+    for i in range(days):
+        row = raw.rows.add()
+        row.dimension_values.add(value=f'{last - timedelta(days=i):%Y%m%d}')
+        for k in range(len(metrics)):
+            row.metric_values.add(value=str((i * 31 + k * 17) % 500))
+    raw.row_count = days
+    return RunReportResponse.wrap(raw)
+
+
+# Replay
+
+class _TableParser(HTMLParser):
+    # Body rows of every <table> as lists of cell text.
+
+    def __init__(self):
+        super().__init__()
+        self.tables = []
+        self._row = None
+        self._cell = None
+
+    def handle_starttag(self, tag, attrs):
+        if tag == 'table':
+            self.tables.append([])
+        elif tag == 'tr' and self.tables:
+            self._row = []
+        elif tag == 'td' and self._row is not None:
+            self._cell = []
+
+    def handle_endtag(self, tag):
+        if tag == 'td' and self._cell is not None:
+            self._row.append(''.join(self._cell).strip())
+            self._cell = None
+        elif tag == 'tr' and self._row is not None:
+            if self._row:
+                self.tables[-1].append(self._row)
+            self._row = None
+
+    def handle_data(self, data):
+        if self._cell is not None:
+            self._cell.append(data)
+
+
+def report_from_page(page):
+    # The JSON report for a recorded campaign page: each section's rows in
+    # page column order, as the Ad Manager report endpoint is expected to send them.
+    parser = _TableParser()
+    parser.feed(page)
+    return {name: parser.tables[index] if len(parser.tables) > index else []
+            for index, name in REPORT_SECTIONS.items()}
+
+
+class FakeAnalyticsClient:
+    # Stands in for BetaAnalyticsDataClient, answering every report with a
+    # recorded response (or one per property), honouring the first date range
+    # (on a date-type dimension) and limit/offset.
+
+    def __init__(self, responses):
+        self.responses = responses
+        self.calls = 0
+
+    def _response(self, property_id):
+        if isinstance(self.responses, dict):
+            return self.responses[property_id]
+        return self.responses
+
+    def run_report(self, request):
+        self.calls += 1
+        recorded = RunReportResponse.pb(self._response(request.property))
+        rows = self._in_date_range(recorded, request)
+        page = RunReportResponse.pb()()
+        page.dimension_headers.extend(recorded.dimension_headers)
+        page.metric_headers.extend(recorded.metric_headers)
+        limit = request.limit or len(rows)
+        page.rows.extend(rows[request.offset:request.offset + limit])
+        page.row_count = len(rows)
+        return RunReportResponse.wrap(page)
+
+    def _in_date_range(self, recorded, request):
+        from google_analytics import DATE_DIMENSION_FORMATS, resolve_date
+        dates = [i for i, header in enumerate(recorded.dimension_headers) if header.name in DATE_DIMENSION_FORMATS]
+        if not request.date_ranges or not dates:
+            return list(recorded.rows)
+        today = date.today()
+        start = f"{resolve_date(request.date_ranges[0].start_date, today):%Y%m%d}"
+        end = f"{resolve_date(request.date_ranges[0].end_date, today):%Y%m%d}"
+        # Every date-type dimension value starts with YYYYMMDD.
+        return [row for row in recorded.rows if start <= row.dimension_values[dates[0]].value[:8] <= end]
+
+    def batch_run_reports(self, request):
+        reports = []
+        for report_request in request.requests:
+            report_request.property = request.property
+            reports.append(self.run_report(report_request))
+        return BatchRunReportsResponse(reports=reports)
+
+
+class ReplayServer:
+    # Local HTTP stand-in for Hulu Ad Manager. Serves a login form at /login
+    # that accepts any credentials and sets a session cookie, recorded pages
+    # from <directory>/hulu/<name>.html at /campaigns/<name>, and their report
+    # JSON at REPORT_PATH (from <directory>/hulu/<name>.json when recorded,
+    # otherwise read off the page's tables). report_requests counts the latter.
+
+    def __init__(self, directory=FIXTURES_DIR, host='127.0.0.1', port=0):
+        self.directory = directory
+        self.server = ThreadingHTTPServer((host, port), self._handler())
+        self.thread = None
+        self.report_requests = 0
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def campaign_url(self, name):
+        return f'{self.url}/campaigns/{name}'
+
+    @property
+    def report_url_template(self):
+        return '{origin}' + REPORT_PATH
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def _handler(self):
+        directory = self.directory
+        replay = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status, body=b'', headers=()):
+                self.send_response(status)
+                for name, value in headers:
+                    self.send_header(name, value)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _logged_in(self):
+                cookie = SimpleCookie(self.headers.get('Cookie', ''))
+                return 'session' in cookie
+
+            def _report(self, name):
+                replay.report_requests += 1
+                if not self._logged_in():
+                    return self._send(401)
+                recorded = os.path.join(directory, 'hulu', name + '.json')
+                page = os.path.join(directory, 'hulu', name + '.html')
+                if os.path.isfile(recorded):
+                    with open(recorded, 'rb') as f:
+                        body = f.read()
+                elif os.path.isfile(page):
+                    with open(page, encoding='utf-8') as f:
+                        body = json.dumps(report_from_page(f.read())).encode('utf-8')
+                else:
+                    return self._send(404)
+                return self._send(200, body, [('Content-Type', 'application/json')])
+
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path == '/login':
+                    return self._send(200, LOGIN_PAGE.encode('utf-8'), [('Content-Type', 'text/html')])
+                prefix, suffix = REPORT_PATH.split('{campaign_id}')
+                if path.startswith(prefix) and path.endswith(suffix):
+                    return self._report(os.path.basename(path[len(prefix):-len(suffix)]))
+                if not self._logged_in():
+                    return self._send(302, headers=[('Location', '/login')])
+                if path.startswith('/campaigns/'):
+                    name = os.path.basename(path.rstrip('/'))
+                    fixture = os.path.join(directory, 'hulu', name + '.html')
+                    if os.path.isfile(fixture):
+                        with open(fixture, 'rb') as f:
+                            return self._send(200, f.read(), [('Content-Type', 'text/html; charset=utf-8')])
+                    return self._send(404)
+                return self._send(200, b'<html><body>Campaigns</body></html>', [('Content-Type', 'text/html')])
+
+            def do_POST(self):
+                self.rfile.read(int(self.headers.get('Content-Length', 0)))
+                if urlparse(self.path).path == '/login':
+                    return self._send(302, headers=[('Location', '/campaigns'),
+                                                    ('Set-Cookie', 'session=replay; Path=/')])
+                return self._send(404)
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record Hulu pages and GA responses as replay fixtures.')
+    sub = parser.add_subparsers(dest='command', required=True)
+    hulu_parser = sub.add_parser('record-hulu')
+    hulu_parser.add_argument('--email', required=True)
+    hulu_parser.add_argument('--password', required=True)
+    hulu_parser.add_argument('--campaign-url', required=True)
+    hulu_parser.add_argument('--name', required=True)
+    ga_parser = sub.add_parser('record-ga')
+    ga_parser.add_argument('--name', required=True)
+    serve_parser = sub.add_parser('serve')
+    serve_parser.add_argument('--port', type=int, default=8060)
+    args = parser.parse_args()
+
+    if args.command == 'record-hulu':
+        import hulu
+        with hulu.driver_pool.lease(args.email, args.password) as driver:
+            hulu.open_campaign(driver, args.email, args.password, args.campaign_url)
+            print(record_hulu_page(driver, args.name))
+    elif args.command == 'record-ga':
+        import google_analytics
+        client = google_analytics.get_client()
+        request = google_analytics.build_request({})
+        print(record_ga_response(client.run_report(request), args.name))
+    else:
+        with ReplayServer(port=args.port) as server:
+            print(f'Serving {server.directory} at {server.url} (Ctrl+C to stop)')
+            server.thread.join()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,260 @@
+import argparse
+import base64
+import gzip
+import hashlib
+import html
+import json
+import mimetypes
+import os
+import tempfile
+from datetime import date, timedelta
+
+# Exported reports and their shared assets; also what /reports serves when set.
+REPORTS_DIR = os.environ.get('REPORTS_DIR')
+# Numeric arrays shorter than this stay plain JSON lists.
+TYPED_ARRAY_MIN_LENGTH = 8
+
+_plotly_asset = {}
+
+
+# Compact figure data
+
+def _typed_array(values):
+    # plotly.js (>= 2.28) reads {'dtype', 'bdata'} objects as little-endian
+    # typed arrays: base64 of 1-4 byte integers or 8 byte floats instead of
+    # one decimal string per value.
+    import numpy as np
+    values = np.asarray(values)
+    if values.dtype.kind == 'f' and np.isfinite(values).all() and (values % 1 == 0).all():
+        values = values.astype('int64')
+    if values.dtype.kind in 'iu':
+        low, high = values.min(), values.max()
+        for dtype in ('i1', 'i2', 'i4'):
+            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                return {'dtype': dtype, 'bdata': base64.b64encode(values.astype('<' + dtype).tobytes()).decode('ascii')}
+    return {'dtype': 'f8', 'bdata': base64.b64encode(values.astype('<f8').tobytes()).decode('ascii')}
+
+
+def _compact(node):
+    import numpy as np
+    if isinstance(node, dict):
+        return {key: _compact(value) for key, value in node.items()}
+    if isinstance(node, (list, tuple, np.ndarray)) and len(node) >= TYPED_ARRAY_MIN_LENGTH:
+        values = np.asarray(node)
+        if values.ndim == 1 and values.dtype.kind in 'iuf':
+            return _typed_array(values)
+    return node
+
+
+def _compact_trace(trace):
+    # Evenly spaced date axes become x0 + dx (milliseconds), as for daily series.
+    import numpy as np
+    trace = dict(trace)
+    x = trace.get('x')
+    if x is not None and len(x) >= TYPED_ARRAY_MIN_LENGTH and np.asarray(x).dtype.kind in 'MUO':
+        try:
+            days = np.asarray(x, dtype='datetime64[ms]')
+        except (TypeError, ValueError):
+            days = None
+        if days is not None and not np.isnat(days).any():
+            steps = np.diff(days).astype('int64')
+            if (steps == steps[0]).all() and steps[0] > 0:
+                del trace['x']
+                trace['x0'] = str(days[0])
+                trace['dx'] = int(steps[0])
+    return _compact(trace)
+
+
+def compact_figure(figure, templates):
+    # Plain figure dict with compact traces. The layout template (the bulk of
+    # a small figure) is moved into templates, keyed by hash, so a page
+    # carries each template once however many figures use it.
+    from plotly.utils import PlotlyJSONEncoder
+    figure = figure if isinstance(figure, dict) else figure.to_dict()
+    layout = dict(figure.get('layout', {}))
+    template = layout.pop('template', None)
+    if template is not None:
+        template_json = json.dumps(template, cls=PlotlyJSONEncoder, sort_keys=True)
+        key = hashlib.sha256(template_json.encode('utf-8')).hexdigest()[:12]
+        templates[key] = template
+        layout['template'] = key
+    return {'data': [_compact_trace(trace) for trace in figure.get('data', [])], 'layout': layout}
+
+
+# Writing
+
+def _write_atomic(path, data):
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', suffix='.tmp')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+def precompress(path):
+    # Writes path.gz, and path.br when brotli is installed, for static serving.
+    with open(path, 'rb') as f:
+        data = f.read()
+    _write_atomic(path + '.gz', gzip.compress(data, compresslevel=9, mtime=0))
+    try:
+        import brotli
+    except ImportError:
+        return
+    _write_atomic(path + '.br', brotli.compress(data))
+
+
+def plotly_asset(asset_dir, compress=True):
+    # The plotly.js bundle shipped with the installed plotly, written once as
+    # plotly-<content hash>.min.js: every report references the same file, and
+    # the name changes whenever the bundle does, so it can be cached forever.
+    # Precompressed copies are written alongside unless compress is False.
+    from plotly.offline import get_plotlyjs
+    if 'name' not in _plotly_asset:
+        bundle = get_plotlyjs().encode('utf-8')
+        _plotly_asset['name'] = f'plotly-{hashlib.sha256(bundle).hexdigest()[:16]}.min.js'
+    path = os.path.join(asset_dir, _plotly_asset['name'])
+    if not os.path.exists(path):
+        _write_atomic(path, get_plotlyjs().encode('utf-8'))
+    if compress and not os.path.exists(path + '.gz'):
+        precompress(path)
+    return path
+
+
+PAGE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>{title}</title>
+<script src="{plotly_src}"></script>
+</head>
+<body>
+<h1>{title}</h1>
+{divs}
+<script>
+var templates = {templates};
+var figures = {figures};
+figures.forEach(function (figure, i) {{
+    if (figure.layout.template) {{
+        figure.layout.template = templates[figure.layout.template];
+    }}
+    Plotly.newPlot('figure-' + i, figure.data, figure.layout, {{responsive: true}});
+}});
+</script>
+</body>
+</html>
+"""
+
+
+def write_report(path, title, figures, asset_dir=None, plotly_src=None, compress=True):
+    # figures are plotly figures or figure dicts. The page references the
+    # shared plotly.js asset in asset_dir (default: <report dir>/assets) by a
+    # relative path, or plotly_src when given (e.g. a CDN URL).
+    from plotly.utils import PlotlyJSONEncoder
+    if plotly_src is None:
+        asset_dir = asset_dir or os.path.join(os.path.dirname(os.path.abspath(path)), 'assets')
+        plotly_src = os.path.relpath(plotly_asset(asset_dir, compress), os.path.dirname(os.path.abspath(path))).replace(os.sep, '/')
+    templates = {}
+    compacted = [compact_figure(figure, templates) for figure in figures]
+    # </script> inside the data must not end the inline script.
+    encode = lambda value: json.dumps(value, cls=PlotlyJSONEncoder, separators=(',', ':')).replace('</', '<\\/')
+    page = PAGE.format(
+        title=html.escape(title),
+        plotly_src=html.escape(plotly_src),
+        divs='\n'.join(f'<div id="figure-{i}"></div>' for i in range(len(compacted))),
+        templates=encode(templates),
+        figures=encode(compacted),
+    )
+    _write_atomic(path, page.encode('utf-8'))
+    if compress:
+        precompress(path)
+    return path
+
+
+def export_reports(reports, directory, plotly_src=None, compress=True):
+    # reports: {name: (title, [figures])}. Writes <directory>/<name>.html, all
+    # sharing <directory>/assets/plotly-<hash>.min.js.
+    asset_dir = os.path.join(directory, 'assets')
+    return [write_report(os.path.join(directory, f'{name}.html'), title, figures,
+                         asset_dir=asset_dir, plotly_src=plotly_src, compress=compress)
+            for name, (title, figures) in reports.items()]
+
+
+# Reports from the metrics store
+
+def ga_report(property_id=None, days=30):
+    from figures import build_ga_figure
+    from google_analytics import METRICS, PROPERTY_ID
+    from metrics_store import metrics_store
+    property_id = property_id or PROPERTY_ID
+    df = metrics_store.ga_daily(property_id, METRICS, start_date=date.today() - timedelta(days=days))
+    if df.empty:
+        raise SystemExit(f'Error: Nothing stored for {property_id} yet.')
+    return 'Google Analytics Data', [build_ga_figure(df)]
+
+
+def hulu_report(campaign_url):
+    from hulu import build_campaign_figure
+    from metrics_store import metrics_store
+    campaign = metrics_store.hulu_campaign(campaign_url)
+    if campaign['daily'].empty:
+        raise SystemExit(f'Error: Nothing stored for {campaign_url} yet.')
+    return f"Hulu Campaign {campaign_url.rstrip('/').split('/')[-1]}", [build_campaign_figure(campaign)]
+
+
+# Serving
+
+def register_reports(server, directory=REPORTS_DIR):
+    # GET /reports/<file> from directory, precompressed (.br/.gz) when the
+    # client accepts it. Hashed assets are cached as immutable. Not registered
+    # unless REPORTS_DIR is set: reports hold campaign data and carry no
+    # per-account checks, so only enable it behind access control.
+    if not directory:
+        return
+    from flask import request, send_from_directory
+    from werkzeug.security import safe_join
+
+    @server.route('/reports/<path:name>')
+    def report_file(name):
+        served = name
+        encoding = None
+        for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+            full = safe_join(directory, name + suffix)
+            if candidate in request.accept_encodings and full and os.path.isfile(full):
+                served, encoding = name + suffix, candidate
+                break
+        immutable = os.path.basename(name).startswith('plotly-')
+        response = send_from_directory(directory, served, mimetype=mimetypes.guess_type(name)[0],
+                                       max_age=31536000 if immutable else 300)
+        if immutable:
+            response.headers['Cache-Control'] += ', immutable'
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        response.headers['Vary'] = 'Accept-Encoding'
+        return response
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export stored GA and Hulu figures as static HTML reports.')
+    parser.add_argument('--out', default=REPORTS_DIR or 'reports')
+    parser.add_argument('--ga', nargs='*', metavar='PROPERTY_ID', help='GA properties (none: the default property)')
+    parser.add_argument('--ga-days', type=int, default=30)
+    parser.add_argument('--hulu', nargs='*', default=[], metavar='CAMPAIGN_URL')
+    parser.add_argument('--plotly-src', help='Load plotly.js from this URL instead of the shared local asset')
+    parser.add_argument('--no-compress', action='store_true')
+    args = parser.parse_args()
+
+    reports = {}
+    if args.ga is not None:
+        for property_id in args.ga or [None]:
+            reports[f"ga-{(property_id or 'default').split('/')[-1]}-{date.today():%Y%m%d}"] = ga_report(property_id, args.ga_days)
+    for url in args.hulu:
+        reports[f"hulu-{url.rstrip('/').split('/')[-1]}-{date.today():%Y%m%d}"] = hulu_report(url)
+    if not reports:
+        parser.error('Nothing to export; pass --ga and/or --hulu.')
+    for path in export_reports(reports, args.out, plotly_src=args.plotly_src, compress=not args.no_compress):
+        print(f'{path} ({os.path.getsize(path) / 1024:.0f} KB, {os.path.getsize(path + ".gz") / 1024:.0f} KB gzipped)'
+              if not args.no_compress else path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+import logging
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+logger = logging.getLogger(__name__)
+
+# One declarative schema per table. 'columns' maps each source column to the
+# output column and how to parse it:
+#   dtype      int64, float64, datetime, category or string
+#   suffix     unit text stripped from the end of each cell ("12,345 impressions")
+#   thousands  thousands separator removed before conversion
+#   split      separator and part index to keep ("Mon, 06/03/24 - Sun, 06/09/24")
+#   path       category path separator; only the last segment is kept ("A | B | C")
+#   format     strptime format for datetime columns
+# 'default' (optional) applies to source columns not listed in 'columns'.
+# Cells that fail to parse are reported and the row is dropped, never coerced to 0.
+
+IMPRESSIONS = {'name': 'impressions', 'dtype': 'int64', 'suffix': ' impressions', 'thousands': ','}
+
+SCHEMAS = {
+    'hulu_daily': {
+        'columns': {
+            'Days': {'name': 'day', 'dtype': 'datetime', 'split': (' - ', 0), 'format': '%a, %m/%d/%y'},
+            'Total Impressions': IMPRESSIONS,
+        },
+    },
+    'hulu_audiences': {
+        'columns': {
+            'Audiences': {'name': 'label', 'dtype': 'category', 'path': '|'},
+            'Impressions': IMPRESSIONS,
+        },
+    },
+    'hulu_platforms': {
+        'columns': {
+            'Platforms': {'name': 'label', 'dtype': 'category'},
+            'Impressions': IMPRESSIONS,
+        },
+    },
+    'hulu_content_genres': {
+        'columns': {
+            'Content Genres': {'name': 'label', 'dtype': 'category'},
+            'Impressions': IMPRESSIONS,
+        },
+    },
+    'ga_daily': {
+        'columns': {
+            'date': {'name': 'date', 'dtype': 'datetime'},
+        },
+        'default': {'dtype': 'float64'},
+    },
+}
+
+
+# Whole cells a numeric column may hold once trimmed and stripped of its
+# suffix and thousands separators; int64 stays within 18 digits so the cast
+# cannot overflow.
+NUMBER_PATTERNS = {
+    'int64': r'^[+-]?\d{1,18}$',
+    'float64': r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$',
+}
+
+
+def _parse_numbers(values, spec):
+    # The whole column at once in Arrow: trim, cut the suffix, drop the
+    # separators and cast. Malformed cells make the cast fail, and only then
+    # is every cell checked and the bad ones nulled.
+    if pd.api.types.infer_dtype(values, skipna=True) != 'string':
+        values = values.astype(str).where(values.notna())
+    text = pc.utf8_trim_whitespace(pa.array(values, type=pa.string(), from_pandas=True))
+    if 'suffix' in spec:
+        suffix = spec['suffix']
+        text = pc.if_else(pc.ends_with(text, suffix), pc.utf8_slice_codeunits(text, 0, -len(suffix)), text)
+    if 'thousands' in spec:
+        text = pc.replace_substring(text, spec['thousands'], '')
+    arrow_type = pa.int64() if spec['dtype'] == 'int64' else pa.float64()
+    try:
+        numbers = pc.cast(text, arrow_type)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        valid = pc.match_substring_regex(text, NUMBER_PATTERNS[spec['dtype']])
+        numbers = pc.cast(pc.if_else(valid, text, pa.scalar(None, pa.string())), arrow_type)
+    return pd.Series(pc.cast(numbers, pa.float64()).to_numpy(zero_copy_only=False), index=values.index)
+
+
+def _parse_labels(values, spec):
+    # Dates and labels repeat from row to row, so each distinct cell is
+    # cleaned and parsed once and the result is spread back by code.
+    codes, uniques = pd.factorize(values)
+    text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+    if 'split' in spec:
+        separator, part = spec['split']
+        text = text.str.split(separator, n=1, regex=False).str[part]
+    if 'path' in spec:
+        text = text.str.rsplit(spec['path'], n=1).str[-1].str.strip()
+
+    if spec['dtype'] == 'datetime':
+        # Code -1 (an empty cell) picks the NaT appended at the end.
+        parsed = pd.to_datetime(text, format=spec.get('format'), errors='coerce').to_numpy()
+        return pd.Series(np.append(parsed, np.datetime64('NaT')).take(codes), index=values.index)
+    if spec['dtype'] == 'category':
+        # Cleaning can merge distinct cells ("A | X", "B | X"), so the labels are factorized again.
+        label_codes, labels = pd.factorize(text)
+        label_codes = np.append(label_codes, -1).take(codes)
+        return pd.Series(pd.Categorical.from_codes(label_codes, labels), index=values.index)
+    return pd.Series(np.append(text.to_numpy(), None).take(codes), index=values.index, dtype='string')
+
+
+def _parse_column(values, spec):
+    # Integer columns come back as float64 here so malformed cells can be NaN;
+    # parse_table casts them once the bad rows are gone.
+    dtype = spec['dtype']
+    if dtype == 'datetime' and pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    if dtype in ('int64', 'float64') and pd.api.types.is_numeric_dtype(values):
+        return values.astype('float64')
+    if dtype in ('int64', 'float64'):
+        return _parse_numbers(values, spec)
+    return _parse_labels(values, spec)
+
+
+def parse_table(df, schema_name):
+    # Returns (parsed, errors). parsed holds only rows whose every schema column
+    # parsed cleanly; errors has one row per rejected cell (row, column, value).
+    # A table without one of its schema columns (e.g. after a page layout
+    # change) is skipped whole: each missing column is one error with no row.
+    schema = SCHEMAS[schema_name]
+    missing = [source for source in schema['columns'] if source not in df.columns]
+    if missing and not df.empty:
+        logger.warning('%s: skipped, missing columns %s', schema_name, ', '.join(missing))
+        return (pd.DataFrame(columns=[spec.get('name', source) for source, spec in schema['columns'].items()]),
+                pd.DataFrame({'row': None, 'column': missing, 'value': None}))
+
+    columns = {}
+    dtypes = {}
+    bad = pd.Series(False, index=df.index)
+    errors = []
+    for source in df.columns:
+        spec = schema['columns'].get(source, schema.get('default'))
+        if spec is None:
+            continue
+        parsed = _parse_column(df[source], spec)
+        if spec['dtype'] in ('int64', 'float64', 'datetime'):
+            failed = parsed.isna()
+            if failed.any():
+                errors.append(pd.DataFrame({'row': df.index[failed], 'column': source,
+                                            'value': df.loc[failed, source].astype(str).values}))
+                bad |= failed
+        name = spec.get('name', source)
+        columns[name] = parsed
+        dtypes[name] = spec['dtype']
+
+    parsed = pd.DataFrame(columns, index=df.index)[~bad].reset_index(drop=True)
+    for name, dtype in dtypes.items():
+        if dtype == 'int64':
+            parsed[name] = parsed[name].astype('int64')
+
+    errors = pd.concat(errors, ignore_index=True) if errors else pd.DataFrame(columns=['row', 'column', 'value'])
+    if not errors.empty:
+        logger.warning('%s: dropped %d malformed cells, e.g. %s=%r', schema_name, len(errors),
+                       errors['column'].iloc[0], errors['value'].iloc[0])
+    return parsed, errors
@@ -0,0 +1,95 @@
+import os
+import sys
+import tempfile
+import time
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('ACCOUNT_KEY_SECRET', 'test')
+
+from driver_pool import DriverPool, DriverSlots
+
+
+class StubDriver:
+    def __init__(self):
+        self.quit_called = False
+
+    def quit(self):
+        self.quit_called = True
+
+
+class DriverPoolSlotsTest(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.drivers = []
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def pool(self, max_size=1, **kwargs):
+        def create_driver():
+            driver = StubDriver()
+            self.drivers.append(driver)
+            return driver
+        pool = DriverPool(create_driver, lambda driver, email, password: None, lambda driver: True,
+                          max_size=max_size, max_rss_mb=0, slots=DriverSlots(self.directory.name, max_size),
+                          **kwargs)
+        pool.SLOT_POLL_SECONDS = 0.1
+        return pool
+
+    def test_expired_session_hands_its_slot_over(self):
+        pool = self.pool(max_idle_seconds=0.5, acquire_timeout=3)
+        with pool.lease('a@example.com', 'secret'):
+            pass
+        time.sleep(1)
+        start = time.monotonic()
+        with pool.lease('a@example.com', 'secret'):
+            pass
+        self.assertLess(time.monotonic() - start, 1)
+        self.assertEqual(pool.launches, 2)
+        self.assertTrue(self.drivers[0].quit_called)
+        pool.close()
+        # Every slot is free again once the pool is closed.
+        slot = pool.slots.try_acquire()
+        self.assertIsNotNone(slot)
+        pool.slots.release(slot)
+
+    def test_other_account_hands_its_slot_over(self):
+        pool = self.pool(acquire_timeout=3)
+        with pool.lease('a@example.com', 'secret'):
+            pass
+        with pool.lease('b@example.com', 'secret'):
+            pass
+        self.assertEqual(pool.launches, 2)
+        self.assertTrue(self.drivers[0].quit_called)
+        pool.close()
+
+    def test_idle_session_gives_its_slot_to_another_worker(self):
+        # Slot locks are per open file, so two pools in one process contend
+        # for slots like two worker processes do.
+        first = self.pool(acquire_timeout=3)
+        second = self.pool(acquire_timeout=3)
+        with first.lease('a@example.com', 'secret'):
+            pass
+        with second.lease('a@example.com', 'secret'):
+            pass
+        self.assertTrue(self.drivers[0].quit_called)
+        self.assertEqual(second.launches, 1)
+        first.close()
+        second.close()
+
+    def test_only_broken_sessions_are_retired(self):
+        pool = self.pool(acquire_timeout=3, is_broken=lambda error: isinstance(error, OSError))
+        with self.assertRaises(ValueError):
+            with pool.lease('a@example.com', 'secret'):
+                raise ValueError('bad campaign URL')
+        with self.assertRaises(OSError):
+            with pool.lease('a@example.com', 'secret'):
+                raise OSError('browser crashed')
+        self.assertEqual(pool.launches, 1)
+        self.assertTrue(self.drivers[0].quit_called)
+        pool.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
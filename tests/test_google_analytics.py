@@ -0,0 +1,54 @@
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('GA_CACHE_DIR', tempfile.mkdtemp())
+
+from google.analytics.data_v1beta.types import MetricType, RunReportRequest, RunReportResponse
+from google_analytics import read_report
+
+
+class PagedClient:
+    # Serves limit/offset pages of one synthetic response, like runReport does.
+    def __init__(self, rows):
+        self.raw = RunReportResponse.pb()()
+        self.raw.dimension_headers.add(name='date')
+        self.raw.dimension_headers.add(name='sessionSourceMedium')
+        self.raw.metric_headers.add(name='sessions', type_=MetricType.TYPE_INTEGER)
+        self.raw.metric_headers.add(name='engagementRate', type_=MetricType.TYPE_FLOAT)
+        for i in range(rows):
+            row = self.raw.rows.add()
+            row.dimension_values.add(value=f'202401{1 + i % 28:02d}')
+            row.dimension_values.add(value='google / organic' if i % 2 else '(direct) / (none)')
+            row.metric_values.add(value=str(i))
+            row.metric_values.add(value=str(i / 100))
+        self.raw.row_count = rows
+
+    def run_report(self, request):
+        page = RunReportResponse.pb()()
+        page.dimension_headers.extend(self.raw.dimension_headers)
+        page.metric_headers.extend(self.raw.metric_headers)
+        page.rows.extend(self.raw.rows[request.offset:request.offset + request.limit])
+        page.row_count = self.raw.row_count
+        return RunReportResponse.wrap(page)
+
+
+class ReadReportTest(unittest.TestCase):
+    def test_columns_are_typed_by_header(self):
+        df = read_report(PagedClient(10), RunReportRequest(), page_size=4)
+        self.assertEqual(len(df), 10)
+        self.assertEqual(str(df['date'].dtype), 'datetime64[ns]')
+        self.assertEqual(str(df['sessionSourceMedium'].dtype), 'category')
+        self.assertEqual(df['sessions'].dtype, 'int64')
+        self.assertEqual(df['engagementRate'].dtype, 'float64')
+        self.assertEqual(df['sessions'].tolist(), list(range(10)))
+
+    def test_chunks_yield_one_frame_per_page(self):
+        frames = list(read_report(PagedClient(10), RunReportRequest(), chunks=True, page_size=4))
+        self.assertEqual([len(frame) for frame in frames], [4, 4, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,13 @@
+import importlib
+import os
+
+from app import create_app
+
+app = create_app()
+server = app.server
+
+# Backends load on first use in each worker. Listing them here, e.g.
+# PRELOAD_BACKENDS=hulu, imports them once in the preloading master instead,
+# trading a slower boot for a faster first request.
+for module in filter(None, (name.strip() for name in os.environ.get('PRELOAD_BACKENDS', '').split(','))):
+    importlib.import_module(module)